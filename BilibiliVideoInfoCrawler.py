@@ -1,22 +1,339 @@
+import os
 import time
 import json
+import base64
 import re
+import shutil
+import queue
+import threading
 import traceback
+from collections import deque
 from datetime import datetime
+import requests
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
-from bs4 import BeautifulSoup
+
+from ResourcePolicy import DEFAULT_BLOCKED_RESOURCES, ResourceReport, apply_blocked_resources, configure_options
+
+# 可选依赖：用于统计Chrome进程内存，按内存上限回收工作进程
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# 脚本数据(window.__INITIAL_STATE__)能提供的字段，HTTP快速模式需要全部拿到才不回退浏览器
+SCRIPT_FIELDS = (
+    'title', 'description', 'pub_date', 'owner_name', 'owner_mid',
+    'play_count', 'danmaku_count', 'comment_count', 'favorite_count',
+    'coin_count', 'share_count', 'like_count',
+)
+
+# videoData.stat中的字段：结果字段名 -> stat字段名
+STAT_FIELDS = (
+    ('play_count', 'view'),
+    ('danmaku_count', 'danmaku'),
+    ('comment_count', 'reply'),
+    ('favorite_count', 'favorite'),
+    ('coin_count', 'coin'),
+    ('share_count', 'share'),
+    ('like_count', 'like'),
+)
+
+# 页面就绪条件：每个条件是一段开销很小的JavaScript表达式，轮询时合并为一次execute_script
+_STAT_JS = (
+    "(window.__INITIAL_STATE__ && window.__INITIAL_STATE__.videoData"
+    " && window.__INITIAL_STATE__.videoData.stat)"
+)
+_SHADOW_COUNT_JS = (
+    "(() => {"
+    " const c = document.querySelector('bili-comments');"
+    " const h = c && c.shadowRoot && c.shadowRoot.querySelector('bili-comments-header-renderer');"
+    " const n = h && h.shadowRoot && h.shadowRoot.querySelector('#count');"
+    " return !!(n && /\\d/.test(n.textContent));"
+    " })()"
+)
+READY_CONDITIONS = {
+    'title': "document.querySelector('#viewbox_report > div.video-info-title > div > h1') !== null",
+    'stat': _STAT_JS,
+    'shadow_count': _SHADOW_COUNT_JS,
+    # 评论数：脚本数据中有reply，或Shadow DOM中的#count已渲染
+    'comment_count': f"({_STAT_JS} && {_STAT_JS}.reply !== undefined) || {_SHADOW_COUNT_JS}",
+}
+
+# 默认每个条件的截止时间（秒，从页面加载开始计算）
+DEFAULT_READY_DEADLINES = {
+    'title': 20,
+    'stat': 3,
+    'comment_count': 3,
+}
+
+# 页面元素选择器：按优先级排列，取第一个有文本的元素
+ELEMENT_SELECTORS = {
+    'title': ["#viewbox_report > div.video-info-title > div > h1"],
+    'description': ["#v_desc > div.basic-desc-info"],
+    'play_count': ["#viewbox_report > div.video-info-meta > div > div.view.item > div"],
+    'danmaku_count': [
+        "#bilibili-player > div > div > div.bpx-player-primary-area > div.bpx-player-sending-area > div > div.bpx-player-video-info > div.bpx-player-video-info-dm > span",
+        "span.dm",
+    ],
+    'like_count': [
+        "#arc_toolbar_report > div.video-toolbar-left > div.video-toolbar-left-main > div:nth-child(1) > div > span",
+        "span.like",
+    ],
+    'coin_count': [
+        "#arc_toolbar_report > div.video-toolbar-left > div.video-toolbar-left-main > div:nth-child(2) > div > span",
+        "span.coin",
+    ],
+    'favorite_count': [
+        "#arc_toolbar_report > div.video-toolbar-left > div.video-toolbar-left-main > div:nth-child(3) > div > span",
+        "span.fav",
+    ],
+    'share_count': ["#share-btn-outer > div > span", "span.share"],
+    'owner_name': [
+        "#v_upinfo > div.up-info > div.up-detail > a",
+        "div.up-info .username",
+        ".up-info .name",
+        ".up-info span",
+        "a.up-name",
+    ],
+}
+
+ELEMENT_LABELS = {
+    'title': '标题',
+    'description': '描述',
+    'play_count': '播放量',
+    'danmaku_count': '弹幕数',
+    'like_count': '点赞数',
+    'coin_count': '投币数',
+    'favorite_count': '收藏数',
+    'share_count': '分享数',
+    'owner_name': 'UP主',
+}
+
+# 有界评论数搜索：只遍历已知评论容器（及其中的Shadow DOM）里的文本节点，
+# 找到"评论"标签附近的数字即停止，超过时间预算则放弃，避免对每个元素读取textContent
+COMMENT_SCAN_JS = """
+const COMMENT_CONTAINER_SELECTORS = ['bili-comments', '#commentapp', '#comment', '.comment-container', '.reply-header'];
+const COMMENT_NUMBER = '(\\\\d+(?:\\\\.\\\\d+)?)\\\\s*([万亿])?';
+const COMMENT_LABEL_RE = new RegExp('评论\\\\s*[(（]?\\\\s*' + COMMENT_NUMBER + '|' + COMMENT_NUMBER + '\\\\s*条?\\\\s*评论');
+const COMMENT_BARE_NUMBER_RE = new RegExp('^\\\\s*[(（]?\\\\s*' + COMMENT_NUMBER + '\\\\s*[)）]?\\\\s*$');
+
+function toCommentCount(num, unit) {
+    let n = parseFloat(num);
+    if (unit === '万') n *= 10000;
+    else if (unit === '亿') n *= 100000000;
+    return Math.round(n);
+}
+
+function scanCommentCount(budgetMs) {
+    const deadline = performance.now() + budgetMs;
+    const roots = [];
+    for (const selector of COMMENT_CONTAINER_SELECTORS) {
+        for (const elem of document.querySelectorAll(selector)) {
+            roots.push(elem);
+            if (elem.shadowRoot) roots.push(elem.shadowRoot);
+        }
+    }
+    if (!roots.length && document.body) roots.push(document.body);
+
+    let visited = 0;
+    for (let i = 0; i < roots.length; i++) {
+        const walker = document.createTreeWalker(roots[i], NodeFilter.SHOW_ELEMENT | NodeFilter.SHOW_TEXT);
+        // 标签和数字可能在相邻的文本节点中，如 <span>评论</span><span>1234</span>
+        let labelLookahead = 0;
+        let node;
+        while ((node = walker.nextNode())) {
+            if ((++visited & 255) === 0 && performance.now() > deadline) {
+                return {count: 0, visited: visited, timedOut: true};
+            }
+            if (node.nodeType === Node.ELEMENT_NODE) {
+                if (node.shadowRoot) roots.push(node.shadowRoot);
+                continue;
+            }
+            const text = node.nodeValue;
+            if (text.indexOf('评论') !== -1) {
+                const m = text.match(COMMENT_LABEL_RE);
+                if (m) {
+                    return {count: m[1] ? toCommentCount(m[1], m[2]) : toCommentCount(m[3], m[4]), visited: visited, timedOut: false};
+                }
+                labelLookahead = 3;
+            } else if (labelLookahead > 0 && text.trim()) {
+                labelLookahead--;
+                const m = text.match(COMMENT_BARE_NUMBER_RE);
+                if (m) {
+                    return {count: toCommentCount(m[1], m[2]), visited: visited, timedOut: false};
+                }
+            }
+        }
+    }
+    return {count: 0, visited: visited, timedOut: false};
+}
+"""
+
+# 页面内一次性提取脚本：脚本数据、所有元素选择器、Shadow DOM评论数在一次execute_script中返回
+# 参数 arguments[0] 为 ELEMENT_SELECTORS，返回值只包含需要的字段，避免传输整页HTML
+PAGE_EXTRACT_JS = COMMENT_SCAN_JS + """
+const selectors = arguments[0];
+const result = {videoData: null, elements: {}, comment: {count: 0, source: null}};
+
+// 1. 脚本数据（window.__INITIAL_STATE__.videoData 中用到的字段）
+let vd = null;
+try {
+    vd = window.__INITIAL_STATE__ && window.__INITIAL_STATE__.videoData;
+    if (vd) {
+        result.videoData = {title: vd.title, desc: vd.desc, pubdate: vd.pubdate, stat: vd.stat};
+        if (vd.owner) {
+            result.videoData.owner = {name: vd.owner.name, mid: vd.owner.mid};
+        }
+    }
+} catch (e) {}
+
+// 2. 页面元素
+for (const field of Object.keys(selectors)) {
+    for (const selector of selectors[field]) {
+        try {
+            const elem = document.querySelector(selector);
+            if (!elem) continue;
+            const text = (field === 'description' ? (elem.innerText || elem.textContent) : elem.textContent).trim();
+            if (text) {
+                result.elements[field] = {text: text, selector: selector};
+                break;
+            }
+        } catch (e) {}
+    }
+}
+
+// 3. 评论数
+function findCommentCount() {
+    // 方法1: 从window.__INITIAL_STATE__中获取
+    if (vd && vd.stat) {
+        return {count: vd.stat.reply, source: 'initial_state'};
+    }
+
+    // 方法2: 访问Shadow DOM获取评论数
+    try {
+        const commentsElement = document.querySelector('bili-comments');
+        if (commentsElement && commentsElement.shadowRoot) {
+            const headerRenderer = commentsElement.shadowRoot.querySelector('bili-comments-header-renderer');
+            if (headerRenderer && headerRenderer.shadowRoot) {
+                const countElement = headerRenderer.shadowRoot.querySelector('#count');
+                if (countElement) {
+                    const match = countElement.textContent.trim().match(/\\d+/);
+                    if (match) {
+                        return {count: parseInt(match[0]), source: 'shadow_dom'};
+                    }
+                }
+            }
+        }
+    } catch (e) {
+        console.log('访问Shadow DOM失败:', e);
+    }
+
+    // 方法3: 在评论容器内有界搜索"评论"标签附近的数字
+    const scanned = scanCommentCount(200);
+    if (scanned.count) {
+        return {count: scanned.count, source: 'text_scan'};
+    }
+
+    return {count: 0, source: null};
+}
+try {
+    result.comment = findCommentCount();
+} catch (e) {}
+
+return result;
+"""
+
+# 页面自身会请求的接口：捕获其响应可直接得到精确数值（不是"1.2万"这样的文本）
+API_CAPTURE_ENDPOINTS = {
+    'view': re.compile(r'api\.bilibili\.com/x/web-interface(?:/wbi)?/view\?'),
+    'reply': re.compile(r'api\.bilibili\.com/x/v2/reply(?:/wbi)?(?:/main)?\?'),
+}
+# 持久化配置目录中可以安全清理的缓存子目录（清理后Cookie等登录状态保留）
+PROFILE_CACHE_DIRS = (
+    'Cache',
+    os.path.join('Default', 'Cache'),
+    os.path.join('Default', 'Code Cache'),
+    os.path.join('Default', 'GPUCache'),
+    os.path.join('Default', 'Service Worker', 'CacheStorage'),
+)
+
+# 最多暂存的未匹配接口响应数（多标签页时其他标签页的响应会暂存到该标签页提取时）
+MAX_CAPTURED_RESPONSES = 500
+
+STATE_MARKER = 'window.__INITIAL_STATE__'
+NEXT_DATA_MARKER = '__NEXT_DATA__'
+_STATE_MARKER_RE = re.compile(r'window\.__INITIAL_STATE__|__NEXT_DATA__')
+_JSON_DECODER = json.JSONDecoder()
+
+
+def extract_initial_state(html):
+    """
+    单次扫描原始HTML，读取window.__INITIAL_STATE__或__NEXT_DATA__后紧跟的一个JSON值
+    支持 window.__INITIAL_STATE__={...};  __NEXT_DATA__ = {...}  以及
+    <script id="__NEXT_DATA__" type="application/json">{...}</script> 三种写法
+    :param html: 页面HTML文本
+    :return: (标记名, 解析后的数据)，未找到时返回 (None, None)
+    """
+    for match in _STATE_MARKER_RE.finditer(html):
+        idx = match.end()
+
+        # <script id="__NEXT_DATA__" ...> 形式：跳到标签结束处
+        if html.startswith(('"', "'"), idx):
+            idx = html.find('>', idx) + 1
+            if idx == 0:
+                continue
+        else:
+            while idx < len(html) and html[idx].isspace():
+                idx += 1
+            if not html.startswith('=', idx):
+                continue
+            idx += 1
+
+        while idx < len(html) and html[idx].isspace():
+            idx += 1
+        if not html.startswith('{', idx):
+            continue
+
+        try:
+            # raw_decode只读取一个完整的JSON值，不受后续分号或函数体影响
+            data, _ = _JSON_DECODER.raw_decode(html, idx)
+        except ValueError:
+            continue
+        return match.group(0), data
+
+    return None, None
+
+
+def dir_size_mb(path):
+    """统计目录占用空间(MB)，目录不存在时返回0"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total / 1024 / 1024
 
 
 class BilibiliVideoCrawler:
-    def __init__(self, headless=True, driver_path=None):
+    def __init__(self, headless=True, driver_path=None, http_first=False, ready_deadlines=None,
+                 block_resources=DEFAULT_BLOCKED_RESOURCES, page_load_strategy='eager', capture_api=False,
+                 profile_dir=None, disk_cache_mb=256):
         """
         初始化爬虫
         :param headless: 是否使用无头模式（不显示浏览器界面）
         :param driver_path: ChromeDriver路径，如果为None则使用系统PATH中的驱动
+        :param http_first: 是否优先使用HTTP快速模式（直接请求页面HTML解析__INITIAL_STATE__，缺字段时才启动浏览器）
+        :param ready_deadlines: 页面就绪条件及截止秒数，如 {'title': 20, 'stat': 3}，默认使用DEFAULT_READY_DEADLINES
+        :param block_resources: 需要拦截的资源类别（media/images/fonts/analytics），传入空元组则不拦截
+        :param page_load_strategy: 页面加载策略，eager不等待图片等子资源
+        :param capture_api: 是否通过CDP捕获页面自身请求的view/reply接口响应，直接用接口JSON构建视频信息
+        :param profile_dir: 持久化的Chrome配置目录（--user-data-dir），跨运行复用JS/CSS缓存和Cookie；None则每次使用空配置
+        :param disk_cache_mb: 磁盘缓存上限(MB)，配置目录超过该值两倍时启动前清理缓存子目录
         """
         self.chrome_options = Options()
         if headless:
@@ -33,23 +350,66 @@ class BilibiliVideoCrawler:
         self.chrome_options.add_experimental_option('useAutomationExtension', False)
 
         # 添加User-Agent
-        self.chrome_options.add_argument(
-            'user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+        self.chrome_options.add_argument(f'user-agent={USER_AGENT}')
 
         # 启用DevTools协议，用于执行JavaScript
         self.chrome_options.add_experimental_option('w3c', True)
 
+        # 持久化配置目录和磁盘缓存（同一目录同时只能被一个Chrome进程使用，进程池会为每个工作进程分配子目录）
+        self.profile_dir = profile_dir
+        self.disk_cache_mb = disk_cache_mb
+        if profile_dir:
+            profile_dir = os.path.abspath(profile_dir)
+            self.chrome_options.add_argument(f'--user-data-dir={profile_dir}')
+            self.chrome_options.add_argument(f"--disk-cache-dir={os.path.join(profile_dir, 'Cache')}")
+            self.chrome_options.add_argument(f'--disk-cache-size={disk_cache_mb * 1024 * 1024}')
+
+        # 页面加载策略和资源拦截（只读取元数据，不需要视频流、图片、字体和统计脚本）
+        configure_options(self.chrome_options, page_load_strategy)
+        self.page_load_strategy = page_load_strategy
+        self.block_resources = tuple(block_resources or ())
+        self.resource_report = ResourceReport()
+
+        # 接口响应捕获（Network.responseReceived + Network.getResponseBody）
+        self.capture_api = capture_api
+        self._api_responses = []
+
         self.driver = None
+        self.headless = headless
         self.driver_path = driver_path
 
+        self.http_first = http_first
+        self.session = None
+
+        self.ready_deadlines = ready_deadlines or dict(DEFAULT_READY_DEADLINES)
+
     def setup_driver(self):
         """设置WebDriver"""
+        if self.profile_dir:
+            self._trim_profile_dir()
+
         if self.driver_path:
             self.driver = webdriver.Chrome(executable_path=self.driver_path, options=self.chrome_options)
         else:
             self.driver = webdriver.Chrome(options=self.chrome_options)
 
-        # 隐藏WebDriver特征
+        self._prepare_tab()
+
+    def _trim_profile_dir(self):
+        """配置目录超过磁盘缓存上限两倍时，清理其中的缓存子目录（保留Cookie，如buvid3）"""
+        size_mb = dir_size_mb(self.profile_dir)
+        if size_mb <= self.disk_cache_mb * 2:
+            return
+
+        print(f"⚠ 配置目录 {self.profile_dir} 占用 {size_mb:.0f} MB，超过上限，清理缓存...")
+        for name in PROFILE_CACHE_DIRS:
+            shutil.rmtree(os.path.join(self.profile_dir, name), ignore_errors=True)
+
+    def _prepare_tab(self):
+        """隐藏WebDriver特征并设置资源拦截（CDP设置只作用于当前标签页，新开标签页后需要再次调用）"""
+        apply_blocked_resources(self.driver, self.block_resources)
+        if self.capture_api:
+            self.driver.execute_cdp_cmd('Network.enable', {})
         self.driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
             'source': '''
                 Object.defineProperty(navigator, 'webdriver', {
@@ -78,12 +438,72 @@ class BilibiliVideoCrawler:
         url = self.bvid_to_url(bvid)
         return self.get_video_info(url)
 
+    def setup_session(self):
+        """设置HTTP会话（HTTP快速模式使用，复用连接）"""
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Referer': 'https://www.bilibili.com/',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+        })
+
     def get_video_info(self, video_url):
         """
         获取B站视频信息
         :param video_url: 视频链接
         :return: 包含视频信息的字典
         """
+        if self.http_first:
+            video_info = self._get_video_info_via_http(video_url)
+            if video_info:
+                return video_info
+
+        return self._get_video_info_with_browser(video_url)
+
+    def _get_video_info_via_http(self, video_url):
+        """
+        HTTP快速模式获取视频信息
+        :param video_url: 视频链接
+        :return: 包含视频信息的字典，字段不全时返回None（需回退到浏览器）
+        """
+        script_data = self._fetch_script_data_via_http(video_url)
+        missing = [key for key in SCRIPT_FIELDS if key not in script_data]
+        if missing:
+            print(f"⚠ HTTP快速模式缺少字段: {', '.join(missing)}，回退到浏览器模式...")
+            return None
+
+        video_info = self._new_video_info(video_url)
+        video_info.update({key: script_data[key] for key in SCRIPT_FIELDS})
+        video_info['field_sources'] = {key: 'http_script' for key in SCRIPT_FIELDS}
+        print("✓ 视频信息获取成功(HTTP快速模式)!")
+        return video_info
+
+    def _fetch_script_data_via_http(self, video_url):
+        """
+        直接请求视频页面HTML，从window.__INITIAL_STATE__中提取数据（不启动浏览器）
+        :param video_url: 视频链接
+        :return: 脚本数据字典，失败时返回空字典
+        """
+        if not self.session:
+            self.setup_session()
+
+        try:
+            print(f"正在请求视频页面(HTTP): {video_url}")
+            response = self.session.get(video_url, timeout=10)
+            response.raise_for_status()
+            response.encoding = 'utf-8'
+            return self._extract_from_scripts(response.text)
+        except Exception as e:
+            print(f"✗ HTTP请求视频页面出错: {str(e)}")
+            return {}
+
+    def _get_video_info_with_browser(self, video_url):
+        """
+        使用浏览器获取B站视频信息
+        :param video_url: 视频链接
+        :return: 包含视频信息的字典
+        """
         if not self.driver:
             self.setup_driver()
 
@@ -91,27 +511,12 @@ class BilibiliVideoCrawler:
             print(f"正在访问视频页面: {video_url}")
             self.driver.get(video_url)
 
-            # 等待页面加载完成
-            wait = WebDriverWait(self.driver, 20)
+            # 轮询就绪条件，所需字段都可用后立即继续
+            self.wait_until_ready(self.ready_deadlines)
 
-            # 等待页面基本加载
-            try:
-                # 等待标题加载
-                wait.until(EC.presence_of_element_located(
-                    (By.CSS_SELECTOR, "#viewbox_report > div.video-info-title > div > h1")))
-                print("✓ 标题元素已加载")
-            except:
-                print("⚠ 标题元素加载超时，继续执行...")
-
-            # 额外等待确保动态内容加载完成
-            time.sleep(3)
-
-            # 获取页面源代码
-            page_source = self.driver.page_source
-            soup = BeautifulSoup(page_source, 'html.parser')
-
-            # 提取数据
-            video_info = self._extract_video_data(soup, video_url)
+            # 提取数据（先读取网络日志，捕获的接口响应可直接使用）
+            self._collect_network_log()
+            video_info = self._extract_video_data(video_url)
 
             print("✓ 视频信息获取成功!")
             return video_info
@@ -128,10 +533,152 @@ class BilibiliVideoCrawler:
                 pass
             return None
 
-    def _extract_video_data(self, soup, video_url):
-        """提取视频数据"""
-        # 初始化视频信息字典
-        video_info = {
+    def _collect_network_log(self):
+        """读取并清空Chrome performance日志，计入资源统计，并记录需要捕获的接口响应"""
+        try:
+            entries = self.driver.get_log('performance')
+        except Exception as e:
+            print(f"⚠ 读取performance日志时出错: {str(e)}")
+            return []
+        self.resource_report.consume(entries)
+        if self.capture_api:
+            self._record_api_responses(entries)
+        return entries
+
+    def _record_api_responses(self, entries):
+        """从Network.responseReceived事件中记录view/reply接口的requestId，响应体在提取时再读取"""
+        for entry in entries:
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, TypeError, ValueError):
+                continue
+            if message.get('method') != 'Network.responseReceived':
+                continue
+
+            params = message.get('params', {})
+            url = params.get('response', {}).get('url', '')
+            for endpoint, pattern in API_CAPTURE_ENDPOINTS.items():
+                if pattern.search(url):
+                    self._api_responses.append({
+                        'endpoint': endpoint,
+                        'url': url,
+                        'request_id': params.get('requestId'),
+                    })
+                    break
+
+        del self._api_responses[:-MAX_CAPTURED_RESPONSES]
+
+    def _get_response_body(self, request_id):
+        """通过CDP读取当前标签页中某个请求的响应体并解析为JSON，失败时返回None"""
+        try:
+            result = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+        except Exception as e:
+            print(f"  ⚠ 读取接口响应失败: {str(e)}")
+            return None
+
+        body = result.get('body', '')
+        if result.get('base64Encoded'):
+            body = base64.b64decode(body).decode('utf-8', errors='replace')
+        try:
+            return json.loads(body)
+        except ValueError:
+            return None
+
+    def _extract_from_api_responses(self, bvid):
+        """
+        用捕获到的接口响应构建视频数据
+        view接口按URL中的bvid匹配；reply接口按oid匹配，需要先从view响应中得到aid
+        :param bvid: 视频BVID
+        :return: (数据字典, {字段: 来源})
+        """
+        api_data = {}
+        sources = {}
+        aid = None
+
+        for endpoint in ('view', 'reply'):
+            for captured in list(self._api_responses):
+                if captured['endpoint'] != endpoint:
+                    continue
+                if endpoint == 'view' and bvid not in captured['url']:
+                    continue
+                if endpoint == 'reply' and (aid is None or f'oid={aid}' not in captured['url']):
+                    continue
+
+                self._api_responses.remove(captured)
+                body = self._get_response_body(captured['request_id'])
+                if not body or body.get('code') != 0:
+                    continue
+                data = body.get('data') or {}
+
+                if endpoint == 'view':
+                    aid = data.get('aid')
+                    fields = {}
+                    self._parse_video_data(data, fields)
+                    api_data.update(fields)
+                    sources.update({key: 'api:view' for key in fields})
+                    print(f"  ✓ 从view接口响应提取到 {len(fields)} 个字段")
+                elif 'comment_count' not in api_data:
+                    count = (data.get('cursor') or {}).get('all_count')
+                    if count is None:
+                        count = (data.get('page') or {}).get('count')
+                    if count is not None:
+                        api_data['comment_count'] = count
+                        sources['comment_count'] = 'api:reply'
+                        print(f"  ✓ 从reply接口响应提取到评论数: {count:,}")
+                break
+
+        return api_data, sources
+
+    def wait_until_ready(self, deadlines, poll_interval=0.1):
+        """
+        轮询页面内的就绪条件，代替固定时长的sleep
+        所有条件合并为一次execute_script检查，每个条件就绪或到达各自的截止时间后不再检查
+        :param deadlines: {条件名: 截止秒数}，条件名见READY_CONDITIONS
+        :param poll_interval: 轮询间隔（秒）
+        :return: {条件名: 就绪耗时(秒)}，超时的条件为None
+        """
+        start = time.monotonic()
+        pending = dict(deadlines)
+        report = {}
+
+        while pending:
+            self._check_ready(pending, start, report)
+            if pending:
+                time.sleep(poll_interval)
+
+        return report
+
+    def _check_ready(self, pending, start, report):
+        """
+        检查一次当前标签页的就绪条件，已就绪或已超时的条件从pending移入report
+        :param pending: {条件名: 截止秒数}，会被修改
+        :param start: 开始等待的时间（time.monotonic()）
+        :param report: {条件名: 就绪耗时(秒)或None}，会被修改
+        """
+        checks = ''.join(
+            f"try {{ r[{json.dumps(name)}] = !!({READY_CONDITIONS[name]}); }} catch (e) {{ r[{json.dumps(name)}] = false; }}\n"
+            for name in pending
+        )
+        try:
+            states = self.driver.execute_script("const r = {};\n" + checks + "return r;") or {}
+        except Exception as e:
+            print(f"⚠ 检查页面就绪状态时出错: {str(e)}")
+            states = {}
+
+        elapsed = time.monotonic() - start
+        for name, deadline in list(pending.items()):
+            if states.get(name):
+                report[name] = elapsed
+                print(f"✓ {name} 已就绪 ({elapsed:.2f}s)")
+                del pending[name]
+            elif elapsed >= deadline:
+                report[name] = None
+                print(f"⚠ {name} 等待超时 ({deadline}s)，继续执行...")
+                del pending[name]
+
+    def _new_video_info(self, video_url):
+        """创建默认值的视频信息字典"""
+        return {
             'bvid': self._extract_bvid_from_url(video_url),
             'url': video_url,
             'title': '',
@@ -148,42 +695,83 @@ class BilibiliVideoCrawler:
             'owner_mid': 0
         }
 
+    def _extract_video_data(self, video_url):
+        """提取视频数据"""
+        # 初始化视频信息字典
+        video_info = self._new_video_info(video_url)
+
         print("\n" + "=" * 60)
         print("开始提取视频数据")
         print("=" * 60)
 
-        # 方法1: 从脚本数据中提取（最准确）
-        print("\n[步骤1] 从脚本数据中提取...")
-        script_data = self._extract_from_scripts(soup)
+        # 方法0: 捕获的接口响应（精确值），字段齐全时不再解析页面
+        api_data, api_sources = {}, {}
+        if self.capture_api:
+            print("\n[步骤0] 解析捕获的接口响应...")
+            api_data, api_sources = self._extract_from_api_responses(video_info['bvid'])
+            missing = [key for key in SCRIPT_FIELDS if key not in api_data]
+            if not missing:
+                video_info.update({key: api_data[key] for key in SCRIPT_FIELDS})
+                video_info['field_sources'] = api_sources
+                print("✓ 接口响应包含全部字段，跳过页面解析")
+                return video_info
+            print(f"  接口响应缺少字段: {', '.join(missing)}，从页面补充")
+
+        # 一次JavaScript往返取回脚本数据、页面元素文本和Shadow DOM评论数
+        print("\n[步骤1] 执行页面内提取脚本...")
+        page_data = self._extract_page_data()
+
+        # 方法1: 脚本数据（最准确）
+        print("\n[步骤2] 解析脚本数据...")
+        script_data = {}
+        if page_data.get('videoData'):
+            self._parse_video_data(page_data['videoData'], script_data)
+            print("✓ 从window.__INITIAL_STATE__提取到数据")
+        else:
+            print("✗ 页面中未找到window.__INITIAL_STATE__.videoData")
 
-        # 方法2: 从页面元素提取（使用你提供的所有选择器）
-        print("\n[步骤2] 从页面元素提取...")
-        element_data = self._extract_from_elements(soup)
+        # 方法2: 页面元素（使用你提供的所有选择器）
+        print("\n[步骤3] 解析页面元素...")
+        elements = page_data.get('elements') or {}
+        element_data = self._extract_from_elements(elements)
 
-        # 方法3: 使用JavaScript提取（专门处理Shadow DOM中的评论数）
-        print("\n[步骤3] 使用JavaScript提取Shadow DOM中的数据...")
-        js_data = self._extract_with_javascript()
+        # 方法3: Shadow DOM中的评论数
+        print("\n[步骤4] 解析Shadow DOM中的评论数...")
+        comment = page_data.get('comment') or {}
+        js_data = self._extract_comment_count(comment)
 
-        # 合并数据
-        print("\n[步骤4] 合并数据...")
+        # 合并数据，同时记录每个字段的来源
+        print("\n[步骤5] 合并数据...")
+        field_sources = {}
         for key in video_info.keys():
             # 评论数优先使用JavaScript提取的数据
             if key == 'comment_count':
                 if js_data.get('comment_count') not in (None, 0):
                     video_info[key] = js_data['comment_count']
+                    field_sources[key] = f"javascript:{comment.get('source')}"
                     print(f"  评论数: 使用JavaScript数据 → {video_info[key]}")
                 elif script_data.get(key) not in (None, 0):
                     video_info[key] = script_data[key]
+                    field_sources[key] = 'script'
                     print(f"  评论数: 使用脚本数据 → {video_info[key]}")
                 elif element_data.get(key) not in (None, 0):
                     video_info[key] = element_data[key]
+                    field_sources[key] = 'element'
                     print(f"  评论数: 使用元素数据 → {video_info[key]}")
             # 其他数据优先使用脚本数据
             else:
                 if key in script_data and script_data[key] not in (None, '', 0):
                     video_info[key] = script_data[key]
+                    field_sources[key] = 'script'
                 elif key in element_data and element_data[key] not in (None, '', 0):
                     video_info[key] = element_data[key]
+                    field_sources[key] = f"element:{elements[key]['selector']}"
+
+        # 接口响应中出现过的字段以接口数据为准
+        for key, value in api_data.items():
+            video_info[key] = value
+            field_sources[key] = api_sources[key]
+        video_info['field_sources'] = field_sources
 
         print("\n" + "=" * 60)
         print("数据提取完成")
@@ -191,6 +779,18 @@ class BilibiliVideoCrawler:
 
         return video_info
 
+    def _extract_page_data(self):
+        """
+        执行页面内提取脚本，一次往返返回精简的JSON对象
+        :return: {'videoData': {...}, 'elements': {字段: {'text', 'selector'}}, 'comment': {'count', 'source'}}
+        """
+        try:
+            return self.driver.execute_script(PAGE_EXTRACT_JS, ELEMENT_SELECTORS) or {}
+        except Exception as e:
+            print(f"✗ 执行页面内提取脚本时出错: {str(e)}")
+            traceback.print_exc()
+            return {}
+
     def _extract_bvid_from_url(self, url):
         """从URL中提取BVID"""
         match = re.search(r'BV[0-9A-Za-z]{10}', url)
@@ -198,325 +798,105 @@ class BilibiliVideoCrawler:
             return match.group(0)
         return ''
 
-    def _extract_from_scripts(self, soup):
-        """从脚本数据中提取视频信息（最准确）"""
+    def _extract_from_scripts(self, page_source):
+        """
+        从脚本数据中提取视频信息（最准确）
+        直接扫描原始HTML定位window.__INITIAL_STATE__/__NEXT_DATA__，不构建DOM
+        """
         script_data = {}
 
         try:
-            # 查找包含视频信息的script标签
-            scripts = soup.find_all('script')
-            for script in scripts:
-                if script.string:
-                    script_text = script.string
-
-                    # 查找 window.__INITIAL_STATE__
-                    if 'window.__INITIAL_STATE__' in script_text:
-                        try:
-                            # 提取JSON数据
-                            json_str = script_text.split('window.__INITIAL_STATE__=')[1]
-                            # 找到第一个分号或函数开始
-                            json_str = json_str.split(';')[0] if ';' in json_str else json_str
-                            json_str = json_str.split('(function')[0] if '(function' in json_str else json_str
-
-                            data = json.loads(json_str)
-
-                            # 提取视频信息
-                            if 'videoData' in data:
-                                video_data = data['videoData']
-
-                                # 基本信息
-                                script_data['title'] = video_data.get('title', '')
-                                script_data['description'] = video_data.get('desc', '')
-                                script_data['pub_date'] = self._format_timestamp(video_data.get('pubdate', 0))
-
-                                # UP主信息
-                                if 'owner' in video_data:
-                                    script_data['owner_name'] = video_data['owner'].get('name', '')
-                                    script_data['owner_mid'] = video_data['owner'].get('mid', 0)
-
-                                # 统计信息
-                                stat = video_data.get('stat', {})
-                                script_data['play_count'] = stat.get('view', 0)
-                                script_data['danmaku_count'] = stat.get('danmaku', 0)
-                                script_data['comment_count'] = stat.get('reply', 0)
-                                script_data['favorite_count'] = stat.get('favorite', 0)
-                                script_data['coin_count'] = stat.get('coin', 0)
-                                script_data['share_count'] = stat.get('share', 0)
-                                script_data['like_count'] = stat.get('like', 0)
-
-                            print("✓ 从window.__INITIAL_STATE__提取到数据")
-                            break
-                        except Exception as e:
-                            print(f"✗ 解析window.__INITIAL_STATE__时出错: {str(e)}")
-                            continue
+            marker, data = extract_initial_state(page_source)
 
-                    # 查找 __NEXT_DATA__ (B站有时使用)
-                    elif '__NEXT_DATA__' in script_text:
-                        try:
-                            json_str = script_text.split('__NEXT_DATA__ = ')[1].split(';')[0]
-                            data = json.loads(json_str)
-
-                            # 尝试提取视频信息
-                            if 'props' in data and 'pageProps' in data['props']:
-                                video_data = data['props']['pageProps'].get('videoData', {})
-
-                                if video_data:
-                                    script_data['title'] = video_data.get('title', '')
-                                    script_data['description'] = video_data.get('desc', '')
-
-                                    # 统计信息
-                                    stat = video_data.get('stat', {})
-                                    script_data['play_count'] = stat.get('view', 0)
-                                    script_data['danmaku_count'] = stat.get('danmaku', 0)
-                                    script_data['comment_count'] = stat.get('reply', 0)
-                                    script_data['favorite_count'] = stat.get('favorite', 0)
-                                    script_data['coin_count'] = stat.get('coin', 0)
-                                    script_data['share_count'] = stat.get('share', 0)
-                                    script_data['like_count'] = stat.get('like', 0)
-
-                            print("✓ 从__NEXT_DATA__提取到数据")
-                            break
-                        except Exception as e:
-                            print(f"✗ 解析__NEXT_DATA__时出错: {str(e)}")
-                            continue
+            if marker == STATE_MARKER:
+                if 'videoData' in data:
+                    self._parse_video_data(data['videoData'], script_data)
+                print("✓ 从window.__INITIAL_STATE__提取到数据")
+
+            elif marker == NEXT_DATA_MARKER:
+                # B站有时使用__NEXT_DATA__
+                if 'props' in data and 'pageProps' in data['props']:
+                    video_data = data['props']['pageProps'].get('videoData', {})
+                    if video_data:
+                        self._parse_video_data(video_data, script_data)
+                print("✓ 从__NEXT_DATA__提取到数据")
+
+            else:
+                print("✗ 页面中未找到window.__INITIAL_STATE__或__NEXT_DATA__")
 
         except Exception as e:
             print(f"✗ 从脚本提取数据时出错: {str(e)}")
 
         return script_data
 
-    def _extract_from_elements(self, soup):
+    def _parse_video_data(self, video_data, script_data):
+        """将videoData中的字段写入script_data"""
+        # 基本信息
+        script_data['title'] = video_data.get('title', '')
+        script_data['description'] = video_data.get('desc', '')
+        if 'pubdate' in video_data:
+            script_data['pub_date'] = self._format_timestamp(video_data.get('pubdate', 0))
+
+        # UP主信息
+        if 'owner' in video_data:
+            script_data['owner_name'] = video_data['owner'].get('name', '')
+            script_data['owner_mid'] = video_data['owner'].get('mid', 0)
+
+        # 统计信息：只写入stat中实际存在的字段，缺少的字段由调用方判断是否回退
+        stat = video_data.get('stat') or {}
+        for key, stat_key in STAT_FIELDS:
+            if stat_key in stat:
+                script_data[key] = stat[stat_key]
+
+    def _extract_from_elements(self, elements):
         """
-        从页面元素提取视频信息
-        使用你提供的所有选择器，除了评论数
+        解析页面元素文本
+        :param elements: 提取脚本返回的 {字段: {'text': 文本, 'selector': 命中的选择器}}
         """
         element_data = {}
 
         try:
-            print("\n[元素提取] 开始使用你提供的选择器...")
-
-            # 1. 标题 - 使用你提供的选择器
-            title_elem = soup.select_one("#viewbox_report > div.video-info-title > div > h1")
-            if title_elem:
-                element_data['title'] = title_elem.get_text(strip=True)
-                print(f"  ✓ 标题: {element_data['title']}")
-            else:
-                print("  ✗ 未找到标题元素")
-
-            # 2. 描述 - 使用你提供的选择器
-            desc_elem = soup.select_one("#v_desc > div.basic-desc-info")
-            if desc_elem:
-                desc_text = desc_elem.get_text(separator='\n', strip=True)
-                if desc_text:
-                    element_data['description'] = desc_text
-                    print(f"  ✓ 描述: {desc_text[:50]}...")
-            else:
-                print("  ✗ 未找到描述元素")
-
-            # 3. 播放量
-            play_elem = soup.select_one("#viewbox_report > div.video-info-meta > div > div.view.item > div")
-            if play_elem:
-                play_text = play_elem.get_text(strip=True)
-                element_data['play_count'] = self._parse_count(play_text)
-                print(f"  ✓ 播放量: {play_text} → {element_data['play_count']:,}")
-            else:
-                print("  ✗ 未找到播放量元素")
-
-            # 4. 弹幕数
-            danmaku_elem = soup.select_one(
-                "#bilibili-player > div > div > div.bpx-player-primary-area > div.bpx-player-sending-area > div > div.bpx-player-video-info > div.bpx-player-video-info-dm > span")
-            if danmaku_elem:
-                danmaku_text = danmaku_elem.get_text(strip=True)
-                element_data['danmaku_count'] = self._parse_count(danmaku_text)
-                print(f"  ✓ 弹幕数: {danmaku_text} → {element_data['danmaku_count']:,}")
-            else:
-                # 尝试备用选择器
-                danmaku_elem = soup.select_one("span.dm")
-                if danmaku_elem:
-                    danmaku_text = danmaku_elem.get_text(strip=True)
-                    element_data['danmaku_count'] = self._parse_count(danmaku_text)
-                    print(f"  ✓ 弹幕数(备用): {danmaku_text} → {element_data['danmaku_count']:,}")
+            for field, label in ELEMENT_LABELS.items():
+                found = elements.get(field)
+                if not found:
+                    print(f"  ✗ 未找到{label}元素")
+                    continue
+
+                text = found['text']
+                if field.endswith('_count'):
+                    element_data[field] = self._parse_count(text)
+                    print(f"  ✓ {label}: {text} → {element_data[field]:,}")
+                elif field == 'description':
+                    # 与get_text(separator='\n', strip=True)一致：去掉空行和行首尾空白
+                    element_data[field] = '\n'.join(
+                        line.strip() for line in text.splitlines() if line.strip())
+                    print(f"  ✓ {label}: {element_data[field][:50]}...")
                 else:
-                    print("  ✗ 未找到弹幕数元素")
-
-            # 5. 点赞数
-            like_elem = soup.select_one(
-                "#arc_toolbar_report > div.video-toolbar-left > div.video-toolbar-left-main > div:nth-child(1) > div > span")
-            if like_elem:
-                like_text = like_elem.get_text(strip=True)
-                element_data['like_count'] = self._parse_count(like_text)
-                print(f"  ✓ 点赞数: {like_text} → {element_data['like_count']:,}")
-            else:
-                # 尝试备用选择器
-                like_elem = soup.select_one("span.like")
-                if like_elem:
-                    like_text = like_elem.get_text(strip=True)
-                    element_data['like_count'] = self._parse_count(like_text)
-                    print(f"  ✓ 点赞数(备用): {like_text} → {element_data['like_count']:,}")
-                else:
-                    print("  ✗ 未找到点赞数元素")
-
-            # 6. 投币数
-            coin_elem = soup.select_one(
-                "#arc_toolbar_report > div.video-toolbar-left > div.video-toolbar-left-main > div:nth-child(2) > div > span")
-            if coin_elem:
-                coin_text = coin_elem.get_text(strip=True)
-                element_data['coin_count'] = self._parse_count(coin_text)
-                print(f"  ✓ 投币数: {coin_text} → {element_data['coin_count']:,}")
-            else:
-                # 尝试备用选择器
-                coin_elem = soup.select_one("span.coin")
-                if coin_elem:
-                    coin_text = coin_elem.get_text(strip=True)
-                    element_data['coin_count'] = self._parse_count(coin_text)
-                    print(f"  ✓ 投币数(备用): {coin_text} → {element_data['coin_count']:,}")
-                else:
-                    print("  ✗ 未找到投币数元素")
-
-            # 7. 收藏数
-            fav_elem = soup.select_one(
-                "#arc_toolbar_report > div.video-toolbar-left > div.video-toolbar-left-main > div:nth-child(3) > div > span")
-            if fav_elem:
-                fav_text = fav_elem.get_text(strip=True)
-                element_data['favorite_count'] = self._parse_count(fav_text)
-                print(f"  ✓ 收藏数: {fav_text} → {element_data['favorite_count']:,}")
-            else:
-                # 尝试备用选择器
-                fav_elem = soup.select_one("span.fav")
-                if fav_elem:
-                    fav_text = fav_elem.get_text(strip=True)
-                    element_data['favorite_count'] = self._parse_count(fav_text)
-                    print(f"  ✓ 收藏数(备用): {fav_text} → {element_data['favorite_count']:,}")
-                else:
-                    print("  ✗ 未找到收藏数元素")
-
-            # 8. 分享数
-            share_elem = soup.select_one("#share-btn-outer > div > span")
-            if share_elem:
-                share_text = share_elem.get_text(strip=True)
-                element_data['share_count'] = self._parse_count(share_text)
-                print(f"  ✓ 分享数: {share_text} → {element_data['share_count']:,}")
-            else:
-                # 尝试备用选择器
-                share_elem = soup.select_one("span.share")
-                if share_elem:
-                    share_text = share_elem.get_text(strip=True)
-                    element_data['share_count'] = self._parse_count(share_text)
-                    print(f"  ✓ 分享数(备用): {share_text} → {element_data['share_count']:,}")
-                else:
-                    print("  ✗ 未找到分享数元素")
-
-            # 9. UP主信息
-            owner_selectors = [
-                "#v_upinfo > div.up-info > div.up-detail > a",
-                "div.up-info .username",
-                ".up-info .name",
-                ".up-info span",
-                "a.up-name"
-            ]
-
-            for selector in owner_selectors:
-                owner_elem = soup.select_one(selector)
-                if owner_elem and owner_elem.get_text(strip=True):
-                    element_data['owner_name'] = owner_elem.get_text(strip=True)
-                    print(f"  ✓ UP主: {element_data['owner_name']}")
-                    break
-            else:
-                print("  ✗ 未找到UP主信息")
+                    element_data[field] = text
+                    print(f"  ✓ {label}: {text}")
 
-            # 评论数暂时不在这里提取，因为它在Shadow DOM中
+            # 评论数在Shadow DOM中，单独处理
             element_data['comment_count'] = 0
 
         except Exception as e:
-            print(f"✗ 使用选择器提取数据时出错: {str(e)}")
+            print(f"✗ 解析页面元素时出错: {str(e)}")
             traceback.print_exc()
 
         return element_data
 
-    def _extract_with_javascript(self):
+    def _extract_comment_count(self, comment):
         """
-        使用JavaScript提取数据
-        专门用于处理Shadow DOM中的元素
+        解析提取脚本返回的评论数
+        :param comment: {'count': 评论数, 'source': 来源}
         """
         js_data = {}
 
-        try:
-            print("\n[JavaScript提取] 开始提取Shadow DOM中的数据...")
-
-            # 提取评论数（在Shadow DOM中）
-            comment_count_js = """
-            // 尝试多种方法获取评论数
-
-            // 方法1: 从window.__INITIAL_STATE__中获取
-            if (window.__INITIAL_STATE__ && window.__INITIAL_STATE__.videoData && window.__INITIAL_STATE__.videoData.stat) {
-                return window.__INITIAL_STATE__.videoData.stat.reply;
-            }
-
-            // 方法2: 尝试访问Shadow DOM获取评论数
-            try {
-                // 找到bili-comments元素
-                const commentsElement = document.querySelector('bili-comments');
-                if (commentsElement && commentsElement.shadowRoot) {
-                    // 进入第一层Shadow DOM
-                    const headerRenderer = commentsElement.shadowRoot.querySelector('bili-comments-header-renderer');
-                    if (headerRenderer && headerRenderer.shadowRoot) {
-                        // 进入第二层Shadow DOM
-                        const countElement = headerRenderer.shadowRoot.querySelector('#count');
-                        if (countElement) {
-                            // 获取文本内容
-                            const text = countElement.textContent.trim();
-                            // 提取数字
-                            const match = text.match(/\\d+/);
-                            if (match) {
-                                return parseInt(match[0]);
-                            }
-                        }
-                    }
-                }
-            } catch (e) {
-                console.log('访问Shadow DOM失败:', e);
-            }
-
-            // 方法3: 直接查询页面中的评论数元素
-            const countElements = document.querySelectorAll('[class*="comment"], [class*="reply"], #comment');
-            for (let elem of countElements) {
-                const text = elem.textContent.trim();
-                if (text && /\\d+/.test(text)) {
-                    const match = text.match(/\\d+/);
-                    if (match) {
-                        return parseInt(match[0]);
-                    }
-                }
-            }
-
-            // 方法4: 查找包含"评论"文本的元素
-            const allElements = document.querySelectorAll('*');
-            for (let elem of allElements) {
-                const text = elem.textContent.trim();
-                if (text.includes('评论') && /\\d+/.test(text)) {
-                    const match = text.match(/\\d+/);
-                    if (match) {
-                        return parseInt(match[0]);
-                    }
-                }
-            }
-
-            return 0;
-            """
-
-            comment_count = self.driver.execute_script(comment_count_js)
-            if comment_count:
-                js_data['comment_count'] = comment_count
-                print(f"  ✓ JavaScript提取评论数: {comment_count:,}")
-            else:
-                print("  ✗ JavaScript未提取到评论数")
-
-            # 可以添加其他需要JavaScript提取的数据
-            # 例如：点赞数、投币数等（如果它们也在Shadow DOM中）
-
-        except Exception as e:
-            print(f"✗ 使用JavaScript提取数据时出错: {str(e)}")
-            traceback.print_exc()
+        comment_count = comment.get('count')
+        if comment_count:
+            js_data['comment_count'] = comment_count
+            print(f"  ✓ JavaScript提取评论数: {comment_count:,} (来源: {comment.get('source')})")
+        else:
+            print("  ✗ JavaScript未提取到评论数")
 
         return js_data
 
@@ -593,10 +973,10 @@ class BilibiliVideoCrawler:
         print('=' * 60)
 
         self.driver.get(url)
-        time.sleep(5)
+        self.wait_until_ready({'shadow_count': 5})
 
         # 测试JavaScript提取
-        test_js = """
+        test_js = COMMENT_SCAN_JS + """
         console.log('开始调试Shadow DOM...');
 
         // 检查是否存在bili-comments元素
@@ -633,20 +1013,10 @@ class BilibiliVideoCrawler:
             }
         }
 
-        // 尝试直接获取评论数
-        const allElements = document.querySelectorAll('*');
-        let foundCount = null;
-        for (let elem of allElements) {
-            const text = elem.textContent.trim();
-            if (text && /\\d+/.test(text) && (elem.id.includes('comment') || elem.className.includes('comment') || text.includes('评论'))) {
-                console.log('可能包含评论数的元素:', elem, '文本:', text);
-                const match = text.match(/\\d+/);
-                if (match) {
-                    foundCount = parseInt(match[0]);
-                    break;
-                }
-            }
-        }
+        // 尝试直接获取评论数（有界搜索）
+        const scanned = scanCommentCount(500);
+        console.log('有界搜索结果:', scanned);
+        const foundCount = scanned.count || null;
 
         console.log('找到的评论数:', foundCount);
         return foundCount;
@@ -658,23 +1028,80 @@ class BilibiliVideoCrawler:
         except Exception as e:
             print(f"JavaScript执行出错: {str(e)}")
 
-        # 同时检查脚本数据
-        page_source = self.driver.page_source
-        soup = BeautifulSoup(page_source, 'html.parser')
-        script_data = self._extract_from_scripts(soup)
-
-        if script_data.get('comment_count'):
-            print(f"脚本数据中的评论数: {script_data['comment_count']}")
+        # 同时检查提取脚本的结果
+        page_data = self._extract_page_data()
+        stat = (page_data.get('videoData') or {}).get('stat') or {}
+        if stat.get('reply'):
+            print(f"脚本数据中的评论数: {stat['reply']}")
+        comment = page_data.get('comment') or {}
+        print(f"提取脚本评论数: {comment.get('count')} (来源: {comment.get('source')})")
 
         return True
 
-    def batch_crawl(self, bvid_list, delay=2):
+    def driver_rss_mb(self):
+        """统计ChromeDriver及其Chrome子进程的常驻内存(MB)，未安装psutil或未启动浏览器时返回0"""
+        if psutil is None or not self.driver:
+            return 0
+        try:
+            process = psutil.Process(self.driver.service.process.pid)
+            processes = [process] + process.children(recursive=True)
+            return sum(p.memory_info().rss for p in processes) / 1024 / 1024
+        except (psutil.Error, AttributeError):
+            return 0
+
+    def crawler_kwargs(self):
+        """返回创建同配置爬虫实例所需的参数（供进程池使用）"""
+        return {
+            'headless': self.headless,
+            'driver_path': self.driver_path,
+            'http_first': self.http_first,
+            'ready_deadlines': self.ready_deadlines,
+            'block_resources': self.block_resources,
+            'page_load_strategy': self.page_load_strategy,
+            'capture_api': self.capture_api,
+            'profile_dir': self.profile_dir,
+            'disk_cache_mb': self.disk_cache_mb,
+        }
+
+    def batch_crawl(self, bvid_list, delay=2, workers=1, tabs=1, max_rate=None, max_pages_per_worker=50,
+                    max_rss_mb=None):
         """
         批量爬取视频信息
         :param bvid_list: BVID列表
-        :param delay: 每个请求之间的延迟（秒）
+        :param delay: 每个请求之间的延迟（秒），多进程时为每个工作进程的延迟
+        :param workers: Chrome工作进程数，大于1时使用CrawlerPool并行爬取
+        :param tabs: 单个Chrome中同时加载的标签页数，大于1时（且workers为1）使用crawl_in_tabs
+        :param max_rate: 多进程时所有工作进程合计每秒最多请求数
+        :param max_pages_per_worker: 多进程时每个Chrome进程最多处理的页面数
+        :param max_rss_mb: 多进程时每个Chrome进程的内存上限(MB)
         :return: 视频信息列表
         """
+        if workers > 1:
+            pool = CrawlerPool(size=workers, delay=delay, max_rate=max_rate,
+                               max_pages_per_worker=max_pages_per_worker, max_rss_mb=max_rss_mb,
+                               **self.crawler_kwargs())
+            results = []
+            for i, video_info in enumerate(pool.imap(bvid_list)):
+                print(f"\n[{i + 1}/{len(bvid_list)}] {video_info.get('bvid')}")
+                if 'error' in video_info:
+                    print(f"✗ 视频 {video_info['bvid']} 爬取失败")
+                else:
+                    self._print_video_info(video_info)
+                results.append(video_info)
+            pool.resource_report.finish_run()
+            return results
+
+        if tabs > 1:
+            results = self.crawl_in_tabs(bvid_list, tabs=tabs, delay=delay)
+            for i, video_info in enumerate(results):
+                print(f"\n[{i + 1}/{len(bvid_list)}] {video_info.get('bvid')}")
+                if 'error' in video_info:
+                    print(f"✗ 视频 {video_info['bvid']} 爬取失败")
+                else:
+                    self._print_video_info(video_info)
+            self.resource_report.finish_run()
+            return results
+
         results = []
 
         for i, bvid in enumerate(bvid_list):
@@ -696,6 +1123,108 @@ class BilibiliVideoCrawler:
                 print(f"等待 {delay} 秒...")
                 time.sleep(delay)
 
+        self.resource_report.finish_run()
+        return results
+
+    def crawl_in_tabs(self, bvid_list, tabs=4, delay=0, poll_interval=0.1):
+        """
+        在同一个Chrome中用多个标签页并行爬取：通过CDP Page.navigate异步发起加载，
+        轮询各标签页的就绪条件，哪个标签页先就绪就先提取，然后立即加载下一个BVID
+        需要pageLoadStrategy为none，否则ChromeDriver会在每个命令前等待页面加载完成，标签页退化为串行
+        :param bvid_list: BVID列表
+        :param tabs: 标签页数
+        :param delay: 相邻两次发起加载之间的最小间隔（秒）
+        :param poll_interval: 轮询间隔（秒）
+        :return: 视频信息列表（与bvid_list顺序一致）
+        """
+        results = [None] * len(bvid_list)
+        todo = deque(enumerate(bvid_list))
+
+        if not self.driver:
+            # 只有这个浏览器使用none，之后的setup_driver（回收、重启）仍使用原来的策略
+            original_strategy = self.chrome_options.page_load_strategy
+            self.chrome_options.page_load_strategy = 'none'
+            try:
+                self.setup_driver()
+            finally:
+                self.chrome_options.page_load_strategy = original_strategy
+        elif self.driver.capabilities.get('pageLoadStrategy') != 'none':
+            print("⚠ 当前浏览器的pageLoadStrategy不是none，标签页加载会被串行化")
+
+        limiter = RateLimiter(1.0 / delay if delay else None)
+        handles = [self.driver.current_window_handle]
+        while len(handles) < min(tabs, len(bvid_list)):
+            self.driver.switch_to.new_window('tab')
+            self._prepare_tab()
+            handles.append(self.driver.current_window_handle)
+
+        # 标签页句柄 -> 正在加载的任务
+        active = {}
+
+        def start_next(handle):
+            while todo:
+                index, bvid = todo.popleft()
+                url = self.bvid_to_url(bvid)
+                if self.http_first:
+                    video_info = self._get_video_info_via_http(url)
+                    if video_info:
+                        results[index] = video_info
+                        continue
+                limiter.wait()
+                self.driver.switch_to.window(handle)
+                print(f"[标签页{handles.index(handle)}] 开始加载第 {index + 1} 个视频: {bvid}")
+                self.driver.execute_cdp_cmd('Page.navigate', {'url': url})
+                active[handle] = {
+                    'index': index,
+                    'bvid': bvid,
+                    'url': url,
+                    'start': time.monotonic(),
+                    'pending': dict(self.ready_deadlines),
+                    'report': {},
+                }
+                return
+
+        for handle in handles:
+            start_next(handle)
+
+        while active:
+            for handle, task in list(active.items()):
+                try:
+                    self.driver.switch_to.window(handle)
+                    # 地址栏还是上一个视频时说明新页面尚未提交，跳过本轮
+                    if task['bvid'] not in self.driver.current_url:
+                        if time.monotonic() - task['start'] < max(task['pending'].values(), default=0):
+                            continue
+                        # 超时仍未跳转时页面上还是上一个视频，不能提取
+                        print(f"✗ 标签页加载 {task['bvid']} 超时，页面未跳转")
+                        video_info = {'bvid': task['bvid'], 'error': '页面未跳转'}
+                    else:
+                        self._check_ready(task['pending'], task['start'], task['report'])
+                        if task['pending']:
+                            continue
+
+                        self._collect_network_log()
+                        video_info = self._extract_video_data(task['url'])
+                except Exception as e:
+                    print(f"✗ 标签页爬取 {task['bvid']} 时出错: {str(e)}")
+                    video_info = None
+
+                results[task['index']] = video_info or {'bvid': task['bvid'], 'error': '爬取失败'}
+                del active[handle]
+                start_next(handle)
+
+            if active:
+                time.sleep(poll_interval)
+
+        # 关闭多余的标签页，只保留第一个
+        for handle in handles[1:]:
+            try:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+            except Exception:
+                pass
+        self.driver.switch_to.window(handles[0])
+
         return results
 
     def _print_video_info(self, video_info):
@@ -732,12 +1261,154 @@ class BilibiliVideoCrawler:
         """关闭浏览器"""
         if self.driver:
             self.driver.quit()
+            self.driver = None
+        if self.session:
+            self.session.close()
+            self.session = None
 
     def __del__(self):
         """析构函数，确保关闭浏览器"""
         self.close()
 
 
+class RateLimiter:
+    """多个线程共享的请求节流器：保证相邻两次请求的开始时间至少间隔 1/max_rate 秒"""
+
+    def __init__(self, max_rate=None):
+        """
+        :param max_rate: 每秒最多请求数，None表示不限制
+        """
+        self.interval = 1.0 / max_rate if max_rate else 0
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_time)
+            self._next_time = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class CrawlerPool:
+    """
+    Chrome进程池：N个工作线程各自持有一个BilibiliVideoCrawler（独立的Chrome进程），
+    从共享队列中取BVID，结果按输入顺序输出；工作进程达到页数或内存上限后自动重建
+    """
+
+    def __init__(self, size=4, delay=2, max_rate=None, max_pages_per_worker=50, max_rss_mb=None,
+                 **crawler_kwargs):
+        """
+        :param size: 工作进程数
+        :param delay: 每个工作进程两次请求之间的延迟（秒）
+        :param max_rate: 所有工作进程合计每秒最多请求数，None表示只按delay节流
+        :param max_pages_per_worker: 每个Chrome进程最多处理的页面数，达到后关闭并重建
+        :param max_rss_mb: Chrome进程（含子进程）内存上限(MB)，超过后重建；需要psutil
+        :param crawler_kwargs: 传给BilibiliVideoCrawler的参数
+        """
+        self.size = size
+        self.delay = delay
+        self.max_pages_per_worker = max_pages_per_worker
+        self.max_rss_mb = max_rss_mb
+        self.crawler_kwargs = crawler_kwargs
+        self.limiter = RateLimiter(max_rate)
+        self.resource_report = ResourceReport()
+        self._report_lock = threading.Lock()
+
+        if max_rss_mb and psutil is None:
+            print("⚠ 未安装psutil，无法按内存上限回收Chrome进程，仅按页数回收")
+
+    def imap(self, bvid_list):
+        """
+        并行爬取视频信息
+        :param bvid_list: BVID列表
+        :return: 生成器，按bvid_list的顺序逐个产出视频信息
+        """
+        tasks = queue.Queue()
+        results = queue.Queue()
+        for item in enumerate(bvid_list):
+            tasks.put(item)
+
+        workers = []
+        for worker_id in range(min(self.size, len(bvid_list))):
+            tasks.put(None)
+            worker = threading.Thread(target=self._worker, args=(worker_id, tasks, results), daemon=True)
+            worker.start()
+            workers.append(worker)
+
+        # 按输入顺序输出：先完成的结果暂存，等前面的结果到齐再产出
+        pending = {}
+        next_index = 0
+        while next_index < len(bvid_list):
+            index, video_info = results.get()
+            pending[index] = video_info
+            while next_index in pending:
+                yield pending.pop(next_index)
+                next_index += 1
+
+        for worker in workers:
+            worker.join()
+
+    def _worker(self, worker_id, tasks, results):
+        """工作线程：持有一个爬虫实例，按页数/内存上限回收"""
+        crawler = None
+        pages = 0
+
+        while True:
+            item = tasks.get()
+            if item is None:
+                break
+            index, bvid = item
+
+            if crawler is None:
+                crawler = BilibiliVideoCrawler(**self._worker_kwargs(worker_id))
+                pages = 0
+
+            self.limiter.wait()
+            print(f"[工作进程{worker_id}] 正在爬取第 {index + 1} 个视频: {bvid}")
+            try:
+                video_info = crawler.get_video_info_by_bvid(bvid)
+            except Exception as e:
+                print(f"[工作进程{worker_id}] ✗ 爬取 {bvid} 时出错: {str(e)}")
+                video_info = None
+            results.put((index, video_info or {'bvid': bvid, 'error': '爬取失败'}))
+            pages += 1
+
+            if self._should_recycle(crawler, pages):
+                print(f"[工作进程{worker_id}] 已处理 {pages} 个页面，重建Chrome进程")
+                self._close_crawler(crawler)
+                crawler = None
+
+            time.sleep(self.delay)
+
+        if crawler:
+            self._close_crawler(crawler)
+
+    def _worker_kwargs(self, worker_id):
+        """每个工作进程使用独立的配置目录子目录，重建Chrome后仍复用同一目录的缓存"""
+        kwargs = dict(self.crawler_kwargs)
+        if kwargs.get('profile_dir'):
+            kwargs['profile_dir'] = os.path.join(kwargs['profile_dir'], f'worker-{worker_id}')
+        return kwargs
+
+    def _close_crawler(self, crawler):
+        """关闭工作进程的爬虫，并把它的资源统计汇总到进程池"""
+        crawler.close()
+        with self._report_lock:
+            self.resource_report.merge(crawler.resource_report)
+
+    def _should_recycle(self, crawler, pages):
+        """判断工作进程是否需要重建"""
+        if self.max_pages_per_worker and pages >= self.max_pages_per_worker:
+            return True
+        if self.max_rss_mb and crawler.driver_rss_mb() > self.max_rss_mb:
+            return True
+        return False
+
+
 def main():
     # 使用说明
     print("""
@@ -746,7 +1417,7 @@ def main():
     专门解决Shadow DOM中的评论数提取问题
 
     1. 确保已安装Chrome浏览器和对应版本的ChromeDriver
-    2. 安装依赖: pip install selenium beautifulsoup4
+    2. 安装依赖: pip install selenium requests
     3. 修改bvid_list中的视频ID为你想要爬取的视频
 
     注意: 请遵守B站的使用条款，不要频繁爬取，尊重网站权益
@@ -755,7 +1426,9 @@ def main():
     # 创建爬虫实例
     # headless=False 可以看到浏览器界面，适合调试
     # headless=True 无界面模式，适合生产环境
-    crawler = BilibiliVideoCrawler(headless=False)
+    # http_first=True 优先直接请求页面HTML，缺少字段时才启动浏览器
+    http_first = input("是否启用HTTP快速模式? (y/n，默认: y): ").strip().lower() != 'n'
+    crawler = BilibiliVideoCrawler(headless=False, http_first=http_first)
 
     # 选择操作模式
     print("\n请选择操作模式:")
@@ -821,8 +1494,15 @@ def main():
         else:
             delay = int(delay)
 
-        print(f"\n开始批量爬取 {len(bvid_list)} 个视频，延迟 {delay} 秒")
-        results = crawler.batch_crawl(bvid_list, delay=delay)
+        workers = input("请输入并行Chrome进程数(默认: 1): ").strip()
+        workers = int(workers) if workers else 1
+        tabs = 1
+        if workers == 1:
+            tabs = input("请输入单个Chrome的并行标签页数(默认: 1): ").strip()
+            tabs = int(tabs) if tabs else 1
+
+        print(f"\n开始批量爬取 {len(bvid_list)} 个视频，延迟 {delay} 秒，并行进程数 {workers}，标签页数 {tabs}")
+        results = crawler.batch_crawl(bvid_list, delay=delay, workers=workers, tabs=tabs)
 
         if results:
             filename = input("\n请输入保存文件名 (默认: bilibili_videos_batch.json): ").strip()
@@ -1,14 +1,24 @@
 import os
+import re
+import sys
+import ast
 import time
 import traceback
 import random
 import json
 import asyncio
+from collections import OrderedDict
+from datetime import date
 
+import aiohttp
 import pandas as pd
-import requests
-from bilibili_api import video, comment, Credential, sync
-from xml.etree import ElementTree as ET
+from bilibili_api import video, comment, Credential
+
+from DanmakuStore import DanmakuStore, DanmakuXmlParser, parse_danmaku_segment
+from DatasetSink import DatasetSink
+from ExcelExport import VideoWorkbook
+from ProgressJournal import ProgressJournal
+from RawArchive import RawArchive
 
 # 设置复杂的User-Agent列表
 USER_AGENTS = [
@@ -56,188 +66,857 @@ def get_credentials():
     return Credential(sessdata=sessdata, bili_jct=bilijct, buvid3=buvid3)
 
 
-def get_video_comments(bvid: str, credential=None, max_comments=10000):
-    comments = []
+class AsyncRateLimiter:
+    """协程共享的请求节流器：保证相邻两次请求的开始时间至少间隔 1/max_rate 秒"""
+
+    def __init__(self, max_rate=None):
+        """
+        :param max_rate: 每秒最多请求数，None表示不限制
+        """
+        self.interval = 1.0 / max_rate if max_rate else 0
+        self._next_time = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        start = max(now, self._next_time)
+        self._next_time = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+# 共享HTTP连接池：总连接数、每个主机的连接数上限、单次请求超时（秒）
+HTTP_MAX_CONNECTIONS = 20
+HTTP_LIMIT_PER_HOST = 6
+HTTP_TIMEOUT = 30
+# 流式读取响应时每次读取的字节数
+HTTP_CHUNK_SIZE = 64 * 1024
+# 通过共享会话发出的请求合计每秒最多请求数（代替各抓取函数各自的随机延迟）
+HTTP_MAX_RATE = 2.0
+
+_http_session = None
+http_limiter = AsyncRateLimiter(HTTP_MAX_RATE)
+
+
+async def get_http_session():
+    """
+    获取进程内共享的aiohttp会话（keep-alive连接池），首次调用时创建
+    所有抓取函数都在同一个事件循环中运行，复用已建立的TCP/TLS连接
+    """
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_MAX_CONNECTIONS,
+            limit_per_host=HTTP_LIMIT_PER_HOST,
+            ttl_dns_cache=300,
+            keepalive_timeout=60,
+        )
+        _http_session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+        )
+    return _http_session
+
+
+async def close_http_session():
+    """关闭共享的aiohttp会话"""
+    global _http_session
+    if _http_session is not None:
+        await _http_session.close()
+        _http_session = None
+
+
+async def fetch_json(url, params=None):
+    """通过共享会话请求JSON接口"""
+    session = await get_http_session()
+    await http_limiter.wait()
+    async with session.get(url, params=params, headers=get_random_headers()) as response:
+        response.raise_for_status()
+        return await response.json(content_type=None)
+
+
+async def fetch_bytes(url, params=None):
+    """通过共享会话请求二进制内容"""
+    session = await get_http_session()
+    await http_limiter.wait()
+    async with session.get(url, params=params, headers=get_random_headers()) as response:
+        response.raise_for_status()
+        return await response.read()
+
+
+async def fetch_chunks(url, params=None, chunk_size=HTTP_CHUNK_SIZE):
+    """
+    通过共享会话流式读取响应内容（已按Content-Encoding解压）
+    :return: 异步生成器，逐块产出bytes
+    """
+    session = await get_http_session()
+    await http_limiter.wait()
+    async with session.get(url, params=params, headers=get_random_headers()) as response:
+        response.raise_for_status()
+        async for chunk in response.content.iter_chunked(chunk_size):
+            yield chunk
+
+
+# 视频元数据缓存：条目有效期（秒）、最多缓存的条目数
+META_CACHE_TTL = 600
+META_CACHE_MAX_ENTRIES = 256
+
+
+class VideoMetaCache:
+    """
+    按BV号缓存view和pagelist接口的返回结果
+    同一个键的并发请求只会发出一次，其余调用方等待同一个结果；
+    条目超过有效期后重新请求，超过容量时淘汰最久未使用的条目
+    """
+
+    VIEW_URL = "https://api.bilibili.com/x/web-interface/view"
+    PAGELIST_URL = "https://api.bilibili.com/x/player/pagelist"
+
+    def __init__(self, ttl=META_CACHE_TTL, max_entries=META_CACHE_MAX_ENTRIES):
+        """
+        :param ttl: 条目有效期（秒）
+        :param max_entries: 最多缓存的条目数
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key, loader):
+        """
+        读取缓存，未命中时调用loader加载
+        :param key: 缓存键
+        :param loader: 无参数的协程函数，返回 (数据, 是否可缓存)
+        :return: 数据
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = task
+        else:
+            self.hits += 1
+        # 某个调用方被取消时不影响其他等待同一结果的调用方
+        return await asyncio.shield(task)
+
+    async def _load(self, key, loader):
+        try:
+            value, cacheable = await loader()
+            if cacheable:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get_view(self, bvid):
+        """获取view接口的完整返回结果（标题、简介、统计数据等）"""
+        async def load():
+            data = await fetch_json(self.VIEW_URL, params={"bvid": bvid})
+            archive_payload(bvid, 'view', 0, data)
+            return data, data.get('code') == 0
+
+        return await self.get(('view', bvid), load)
+
+    async def get_pagelist(self, bvid):
+        """获取pagelist接口的完整返回结果（各分P的cid）"""
+        async def load():
+            data = await fetch_json(self.PAGELIST_URL, params={"bvid": bvid, "jsonp": "jsonp"})
+            archive_payload(bvid, 'pagelist', 0, data)
+            return data, data.get('code') == 0
+
+        return await self.get(('pagelist', bvid), load)
+
+
+meta_cache = VideoMetaCache()
+
+
+# 原始响应归档（RawArchive），为None时不归档；main在 --archive 模式下设置
+raw_archive = None
+
+
+def archive_payload(bvid, endpoint, page, payload):
+    """把接口原始返回写入raw_archive，未启用归档时什么都不做，归档失败不影响抓取"""
+    if raw_archive is None:
+        return
     try:
-        v = video.Video(bvid=bvid, credential=credential)
-        page = 1
-        count = 0
-        retry_count = 0
-        max_retries = 3
+        raw_archive.put(bvid, endpoint, page, payload)
+    except Exception as e:
+        print(f"归档BV号 {bvid} 的{endpoint}接口响应失败: {str(e)}")
 
-        while count < max_comments and retry_count < max_retries:
-            try:
-                # 增加随机延迟，模拟人类行为
-                delay = random.uniform(2, 5)  # 2-5秒随机延迟
-                time.sleep(delay)
 
-                res = sync(comment.get_comments(
-                    oid=v.get_aid(),
+# 评论分页抓取：同时在途的最大页数、所有请求共享的速率上限（每秒请求数）、单页最大重试次数
+COMMENT_CONCURRENCY = 4
+COMMENT_MAX_RATE = 2.0
+COMMENT_MAX_RETRIES = 3
+
+
+class CommentFetchError(Exception):
+    """某一页评论重试次数用尽，评论没有获取完整（与"已经没有更多评论"区分开）"""
+
+
+async def fetch_comment_page(bvid, aid, page, credential, semaphore, limiter, order=None):
+    """
+    获取一页评论，失败时重试
+    :param order: 排序方式（comment.OrderType），None为接口默认
+    :return: 接口返回的结果字典，重试次数用尽时返回None
+    """
+    kwargs = {} if order is None else {'order': order}
+    for retry_count in range(1, COMMENT_MAX_RETRIES + 1):
+        async with semaphore:
+            await limiter.wait()
+            try:
+                res = await comment.get_comments(
+                    oid=aid,
                     type_=comment.CommentResourceType.VIDEO,
                     page_index=page,
-                    credential=credential
-                ))
-
+                    credential=credential,
+                    **kwargs
+                )
+            except Exception as e:
+                print(f"BV号 {bvid} 第{page}页获取失败，第{retry_count}次重试，错误: {str(e)}")
+                traceback.print_exc()
+            else:
                 # 检查返回结果是否有效
-                if not res or not isinstance(res, dict):
-                    print(f"BV号 {bvid} 第{page}页返回结果无效")
-                    retry_count += 1
-                    continue
+                if res and isinstance(res, dict):
+                    # 按时间排序的页面（增量更新）单独归档，与默认排序的同一页码不冲突
+                    archive_payload(bvid, 'reply' if order is None else 'reply_time', page, res)
+                    return res
+                print(f"BV号 {bvid} 第{page}页返回结果无效")
 
-                # 安全地获取replies
-                replies = res.get("replies")
-                if replies is None:
-                    print(f"BV号 {bvid} 第{page}页没有replies字段")
-                    break
+        if retry_count < COMMENT_MAX_RETRIES:
+            # 重试前等待更长时间
+            await asyncio.sleep(random.uniform(10, 15))
 
-                if not isinstance(replies, list):
-                    print(f"BV号 {bvid} 第{page}页replies字段不是列表类型: {type(replies)}")
-                    break
+    print(f"BV号 {bvid} 评论获取失败，已达到最大重试次数")
+    return None
 
-                if not replies:
-                    print(f"BV号 {bvid} 第{page}页没有更多评论")
-                    break
 
-                print(f"BV号 {bvid} 第{page}页获取到{len(replies)}条评论")
-
-                for r in replies:
-                    # 检查评论结构是否完整
-                    if not r or not isinstance(r, dict):
-                        print(f"跳过无效的评论条目: {r}")
-                        continue
-
-                    try:
-                        # 安全地获取评论内容
-                        content = r.get("content", {})
-                        if not content or not isinstance(content, dict):
-                            print(f"评论内容格式异常: {r}")
-                            continue
-
-                        message = content.get("message", "")
-                        if not message:
-                            continue
-
-                        comm = {
-                            'comment': message,
-                            'reply': [],
-                        }
-
-                        # 安全地获取用户信息
-                        member = r.get("member", {})
-                        if member and isinstance(member, dict):
-                            uname = member.get("uname", "未知用户")
-                        else:
-                            uname = "未知用户"
-
-                        # 处理回复
-                        reply_list = r.get("replies", [])
-                        if reply_list and isinstance(reply_list, list):
-                            for reply in reply_list:
-                                if not reply or not isinstance(reply, dict):
-                                    continue
-
-                                reply_content = reply.get("content", {})
-                                if not reply_content or not isinstance(reply_content, dict):
-                                    continue
-
-                                reply_message = reply_content.get("message", "")
-                                if reply_message:
-                                    reply_text = f"回复@{uname}: {reply_message}"
-                                    comm['reply'].append(reply_text)
-
-                        comments.append(comm)
-                        count += 1
-
-                        # 每处理10条评论增加一个小延迟
-                        if count % 10 == 0:
-                            time.sleep(random.uniform(0.5, 1.5))
-
-                    except Exception as e:
-                        print(f"处理单条评论时出错: {str(e)}")
-                        continue
-
-                # 检查是否还有更多页面
-                page_info = res.get("page", {})
-                if not page_info:
-                    print(f"BV号 {bvid} 没有分页信息")
-                    break
+async def iter_comment_pages(bvid, credential=None, start_page=1, concurrency=COMMENT_CONCURRENCY,
+                             max_rate=COMMENT_MAX_RATE, order=None, max_comments=None):
+    """
+    按页码顺序逐页产出评论
+    拿到第一页的分页信息后，预先发起后续页面的请求（最多concurrency页同时在途，速率受max_rate限制），
+    调用方停止迭代后需要 await aclose()，尚未用到的请求会被取消
+    :param order: 排序方式（comment.OrderType），None为接口默认
+    :param max_comments: 调用方最多需要的评论数，预取不超过凑够这些评论所需的页数，
+                         调用方还没停止时之后的页面逐页请求
+    :return: 异步生成器，产出 (页码, replies列表, 接口原始结果)
+    :raises CommentFetchError: 某一页重试次数用尽
+    """
+    aid = video.Video(bvid=bvid, credential=credential).get_aid()
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = AsyncRateLimiter(max_rate)
 
-                current_num = page_info.get("num", 0) * page_info.get("size", 0)
-                total_count = page_info.get("count", 0)
+    tasks = {}
+    page = start_page
+    next_page = start_page
+    # 已知存在的最后一页，拿到分页信息前只请求当前页
+    last_page = start_page
 
-                if current_num >= total_count:
-                    print(f"BV号 {bvid} 评论获取完成，共{count}条评论")
-                    break
+    try:
+        while True:
+            while next_page <= last_page and len(tasks) < concurrency:
+                tasks[next_page] = asyncio.ensure_future(
+                    fetch_comment_page(bvid, aid, next_page, credential, semaphore, limiter, order))
+                next_page += 1
+
+            res = await tasks.pop(page)
+            if res is None:
+                raise CommentFetchError(f"BV号 {bvid} 第{page}页评论重试次数用尽")
+
+            # 安全地获取replies
+            replies = res.get("replies")
+            if replies is None:
+                print(f"BV号 {bvid} 第{page}页没有replies字段")
+                return
+
+            if not isinstance(replies, list):
+                print(f"BV号 {bvid} 第{page}页replies字段不是列表类型: {type(replies)}")
+                return
+
+            if not replies:
+                print(f"BV号 {bvid} 第{page}页没有更多评论")
+                return
+
+            print(f"BV号 {bvid} 第{page}页获取到{len(replies)}条评论")
+            yield page, replies, res
+
+            # 检查是否还有更多页面
+            page_info = res.get("page", {})
+            if not page_info:
+                print(f"BV号 {bvid} 没有分页信息")
+                return
+
+            page_size = page_info.get("size", 0)
+            current_num = page_info.get("num", 0) * page_size
+            total_count = page_info.get("count", 0)
+
+            if current_num >= total_count:
+                return
+
+            if page_size:
+                last_page = max(last_page, -(-total_count // page_size))
+                if max_comments is not None:
+                    last_page = min(last_page, start_page - 1 + max(1, -(-max_comments // page_size)))
+            page += 1
+            last_page = max(last_page, page)
+    finally:
+        for task in tasks.values():
+            task.cancel()
+
+
+def parse_comment(r):
+    """
+    将接口返回的一条评论转换为 {'comment': 内容, 'reply': [回复文本], 'rpid': 评论ID, 'ctime': 发布时间戳,
+    'mid': 作者ID, 'uname': 作者昵称, 'like': 点赞数, 'sub_replies': [预览回复，格式同parse_sub_reply]}
+    :return: 评论字典，无效或内容为空时返回None
+    """
+    # 检查评论结构是否完整
+    if not r or not isinstance(r, dict):
+        print(f"跳过无效的评论条目: {r}")
+        return None
+
+    try:
+        # 安全地获取评论内容
+        content = r.get("content", {})
+        if not content or not isinstance(content, dict):
+            print(f"评论内容格式异常: {r}")
+            return None
+
+        message = content.get("message", "")
+        if not message:
+            return None
+
+        # 安全地获取用户信息
+        member = r.get("member", {})
+        if member and isinstance(member, dict):
+            uname = member.get("uname", "未知用户")
+        else:
+            uname = "未知用户"
+
+        comm = {
+            'comment': message,
+            'reply': [],
+            'rpid': r.get("rpid"),
+            'ctime': r.get("ctime"),
+            'mid': r.get("mid"),
+            'uname': uname,
+            'like': r.get("like"),
+            'sub_replies': [],
+        }
+
+        # 处理回复，reply为"回复者: 内容"（与深度模式一致）
+        reply_list = r.get("replies", [])
+        if reply_list and isinstance(reply_list, list):
+            for reply in reply_list:
+                item = parse_sub_reply(reply)
+                if item:
+                    comm['reply'].append(f"{item['uname']}: {item['message']}")
+                    comm['sub_replies'].append(item)
+
+        return comm
+
+    except Exception as e:
+        print(f"处理单条评论时出错: {str(e)}")
+        return None
+
+
+# 楼中楼展开：每个视频同时在途的请求数、所有视频共享的速率上限（每秒请求数）、每页回复数
+SUB_REPLY_CONCURRENCY = 4
+SUB_REPLY_MAX_RATE = 2.0
+SUB_REPLY_PAGE_SIZE = 20
 
-                page += 1
-                retry_count = 0  # 重置重试计数
+sub_reply_limiter = AsyncRateLimiter(SUB_REPLY_MAX_RATE)
 
+
+async def fetch_sub_reply_page(bvid, aid, root, page, credential, semaphore):
+    """
+    获取一条评论下的一页回复，网络或接口返回错误时重试
+    :param root: 根评论的rpid
+    :return: 接口返回的结果字典，重试次数用尽时返回None
+    :raises AttributeError, TypeError: 调用方式与bilibili_api版本不符，重试没有意义，直接抛出
+    """
+    root_comment = comment.Comment(aid, comment.CommentResourceType.VIDEO, root, credential)
+    for retry_count in range(1, COMMENT_MAX_RETRIES + 1):
+        async with semaphore:
+            await sub_reply_limiter.wait()
+            try:
+                res = await root_comment.get_sub_comments(page_index=page, page_size=SUB_REPLY_PAGE_SIZE)
+            except (AttributeError, TypeError):
+                raise
             except Exception as e:
-                retry_count += 1
-                print(f"BV号 {bvid} 第{page}页获取失败，第{retry_count}次重试，错误: {str(e)}")
-                traceback.print_exc()
+                print(f"BV号 {bvid} 评论{root}的第{page}页回复获取失败，第{retry_count}次重试，错误: {str(e)}")
+            else:
+                if res and isinstance(res, dict):
+                    archive_payload(bvid, 'sub_reply', f"{root}:{page}", res)
+                    return res
+                print(f"BV号 {bvid} 评论{root}的第{page}页回复返回结果无效")
 
-                if retry_count >= max_retries:
-                    print(f"BV号 {bvid} 评论获取失败，已达到最大重试次数")
-                    break
+        if retry_count < COMMENT_MAX_RETRIES:
+            await asyncio.sleep(random.uniform(10, 15))
+
+    return None
+
+
+def parse_sub_reply(reply):
+    """
+    将接口返回的一条回复转换为带作者和父评论ID的字典
+    :return: {'rpid', 'root', 'parent', 'mid', 'uname', 'message', 'ctime', 'like'}，无效时返回None
+    """
+    if not reply or not isinstance(reply, dict):
+        return None
+    content = reply.get("content") or {}
+    message = content.get("message", "") if isinstance(content, dict) else ""
+    if not message:
+        return None
+    member = reply.get("member") or {}
+    return {
+        'rpid': reply.get("rpid"),
+        'root': reply.get("root"),
+        'parent': reply.get("parent"),
+        'mid': reply.get("mid"),
+        'uname': member.get("uname", "未知用户") if isinstance(member, dict) else "未知用户",
+        'message': message,
+        'ctime': reply.get("ctime"),
+        'like': reply.get("like"),
+    }
 
-                # 重试前等待更长时间
-                time.sleep(random.uniform(10, 15))
+
+async def expand_sub_replies(bvid, aid, r, credential, semaphore):
+    """
+    分页获取一条根评论下的全部回复：先取第一页得到回复总数，其余页并发获取
+    :param r: 接口返回的根评论
+    :return: 回复字典列表（按接口顺序，按rpid去重）
+    :raises CommentFetchError: 某一页回复重试次数用尽（不能用不完整的预览回复代替）
+    """
+    root = r.get("rpid")
+    first = await fetch_sub_reply_page(bvid, aid, root, 1, credential, semaphore)
+    if first is None:
+        raise CommentFetchError(f"BV号 {bvid} 评论{root}的第1页回复重试次数用尽")
+
+    page_info = first.get("page") or {}
+    page_size = page_info.get("size") or SUB_REPLY_PAGE_SIZE
+    total_pages = -(-page_info.get("count", 0) // page_size)
+    rest = await asyncio.gather(
+        *(fetch_sub_reply_page(bvid, aid, root, page, credential, semaphore) for page in range(2, total_pages + 1)))
+
+    sub_replies = []
+    seen = set()
+    for page, res in enumerate([first] + list(rest), 1):
+        if res is None:
+            raise CommentFetchError(f"BV号 {bvid} 评论{root}的第{page}页回复重试次数用尽")
+        for reply in res.get("replies") or []:
+            item = parse_sub_reply(reply)
+            if item and item['rpid'] not in seen:
+                seen.add(item['rpid'])
+                sub_replies.append(item)
+    return sub_replies
+
+
+async def expand_page_replies(bvid, aid, pairs, credential, semaphore):
+    """
+    深度模式：为一页中的每条评论补全全部回复（各评论并发，受semaphore和全局速率限制）
+    预览中已包含全部回复的评论不再请求
+    :param pairs: [(接口返回的根评论, parse_comment的结果), ...]
+    :raises CommentFetchError: 某条评论的回复没有获取完整，调用方不应记录该页
+    """
+    async def expand(r, comm):
+        preview = r.get("replies") or []
+        if r.get("rcount", 0) > len(preview):
+            sub_replies = await expand_sub_replies(bvid, aid, r, credential, semaphore)
+        else:
+            sub_replies = [item for item in map(parse_sub_reply, preview) if item]
+        comm['reply'] = [f"{item['uname']}: {item['message']}" for item in sub_replies]
+        comm['sub_replies'] = sub_replies
+
+    await asyncio.gather(*(expand(r, comm) for r, comm in pairs))
+
+
+async def iter_video_comments(bvid: str, credential=None, max_comments=10000, concurrency=COMMENT_CONCURRENCY,
+                              max_rate=COMMENT_MAX_RATE, journal=None, deep=False):
+    """
+    逐页产出视频评论，内存中只保留当前页
+    :param bvid: 视频BV号
+    :param credential: 凭证
+    :param max_comments: 最多获取的评论数（按页判断，与逐页抓取时一致）
+    :param concurrency: 同时在途的最大页数
+    :param max_rate: 每秒最多请求数
+    :param journal: ProgressJournal，给定时逐页记录进度，并从上次中断的页码继续（先产出已记录的页）
+    :param deep: 深度模式，分页获取每条评论下的全部回复（sub_replies含回复者mid、rpid、root、parent），
+                 默认只取评论自带的预览回复；两种模式的reply都为"回复者: 内容"
+    :return: 异步生成器，产出 (页码, 该页的评论列表)；评论按rpid去重，
+             中断期间新发的评论使页面边界移动时，续抓的页面中已产出过的评论不会重复出现
+    :raises CommentFetchError: 某一页评论（深度模式下或某条评论的回复）重试次数用尽，
+                               此时该页和评论已抓取完成都不记录，下次运行从该页继续
+    """
+    count = 0
+    start_page = 1
+    seen = set()
+
+    def unseen(page_comments):
+        result = []
+        for comm in page_comments:
+            rpid = comm.get('rpid')
+            if rpid is not None:
+                if rpid in seen:
+                    continue
+                seen.add(rpid)
+            result.append(comm)
+        return result
+
+    if journal is not None:
+        start_page, finished = journal.resume_state(bvid)
+        for page, page_comments in journal.iter_pages(bvid):
+            page_comments = unseen(page_comments)
+            count += len(page_comments)
+            yield page, page_comments
+        if start_page > 1:
+            print(f"BV号 {bvid} 从进度日志恢复{count}条评论，从第{start_page}页继续")
+        if finished or count >= max_comments:
+            print(f"BV号 {bvid} 评论获取完成，共{count}条评论")
+            return
+
+    pages = iter_comment_pages(bvid, credential, start_page=start_page, concurrency=concurrency, max_rate=max_rate,
+                               max_comments=max_comments - count)
+    if deep:
+        aid = video.Video(bvid=bvid, credential=credential).get_aid()
+        sub_semaphore = asyncio.Semaphore(SUB_REPLY_CONCURRENCY)
+
+    try:
+        async for page, replies, _ in pages:
+            page_comments = []
+            pairs = []
+            for r in replies:
+                comm = parse_comment(r)
+                if comm:
+                    page_comments.append(comm)
+                    pairs.append((r, comm))
+
+            if deep:
+                await expand_page_replies(bvid, aid, pairs, credential, sub_semaphore)
+
+            page_comments = unseen(page_comments)
+            count += len(page_comments)
+            if journal is not None:
+                journal.record_page(bvid, page, page_comments)
+            yield page, page_comments
+
+            if count >= max_comments:
+                break
+
+        print(f"BV号 {bvid} 评论获取完成，共{count}条评论")
+        if journal is not None:
+            journal.record_comments_done(bvid)
 
     except Exception as e:
         print(f"获取BV号 {bvid} 评论时发生错误: {str(e)}")
         traceback.print_exc()
+        raise
+    finally:
+        await pages.aclose()
 
+
+async def get_video_comments(bvid: str, credential=None, max_comments=10000, concurrency=COMMENT_CONCURRENCY,
+                             max_rate=COMMENT_MAX_RATE, journal=None, deep=False):
+    """
+    获取视频评论（含评论下的预览回复），参数同iter_video_comments
+    :return: 评论列表
+    :raises: 评论没有获取完整时抛出iter_video_comments的异常
+    """
+    comments = []
+    pages = iter_video_comments(bvid, credential, max_comments, concurrency, max_rate, journal, deep)
+    try:
+        async for _, page_comments in pages:
+            comments.extend(page_comments)
+    finally:
+        await pages.aclose()
     return comments
 
 
-def get_cid(bvid):
+async def stream_video_comments(bvid: str, sink, credential=None, **kwargs):
+    """
+    边抓取边写入：每收到一页评论就交给sink，峰值内存只与单页评论数有关
+    :param sink: 具有 write_page(页码, 评论列表) 方法的对象
+    :param kwargs: 传给iter_video_comments的其他参数
+    :return: 写入的评论数
+    """
+    count = 0
+    pages = iter_video_comments(bvid, credential, **kwargs)
+    try:
+        async for page, page_comments in pages:
+            sink.write_page(page, page_comments)
+            count += len(page_comments)
+    finally:
+        await pages.aclose()
+    return count
+
+
+# 增量更新时同时在途的页数：按时间排序遇到已保存的评论就停止，预取的页面大多用不上
+REFRESH_CONCURRENCY = 1
+
+
+def merge_comments(new_comments, existing):
+    """
+    合并新抓取的评论和已保存的评论，按rpid去重（保留先出现的一条），没有rpid的评论原样保留
+    :return: 新评论在前的评论列表
+    """
+    merged = []
+    seen = set()
+    for comm in list(new_comments) + list(existing):
+        rpid = comm.get('rpid')
+        if rpid is not None:
+            if rpid in seen:
+                continue
+            seen.add(rpid)
+        merged.append(comm)
+    return merged
+
+
+async def refresh_video_comments(bvid: str, existing, credential=None, max_comments=10000,
+                                 concurrency=REFRESH_CONCURRENCY, max_rate=COMMENT_MAX_RATE, deep=False):
+    """
+    增量更新视频评论：按发布时间从新到旧抓取，遇到第一条已保存的评论即停止，新评论与已保存的评论合并去重
+    已保存评论下新增的回复不会更新
+    :param existing: 已保存的评论列表（需含rpid，没有rpid时改为完整抓取）
+    :param max_comments: 本次最多新增的评论数
+    :param deep: 是否展开新评论下的全部回复
+    :return: 合并后的评论列表
+    :raises: 没有抓取到第一条已保存的评论就中断时抛出异常，避免保存有缺口的评论
+    """
+    known = {comm['rpid'] for comm in existing if comm.get('rpid') is not None}
+    if not known:
+        print(f"BV号 {bvid} 已保存的评论没有rpid，重新完整抓取")
+        return await get_video_comments(bvid, credential, max_comments, COMMENT_CONCURRENCY, max_rate, deep=deep)
+
+    new_comments = []
+    pages = iter_comment_pages(bvid, credential, concurrency=concurrency, max_rate=max_rate,
+                               order=comment.OrderType.TIME, max_comments=max_comments)
+    if deep:
+        aid = video.Video(bvid=bvid, credential=credential).get_aid()
+        sub_semaphore = asyncio.Semaphore(SUB_REPLY_CONCURRENCY)
+
+    try:
+        async for page, replies, _ in pages:
+            reached = False
+            pairs = []
+            for r in replies:
+                if isinstance(r, dict) and r.get("rpid") in known:
+                    reached = True
+                    break
+                comm = parse_comment(r)
+                if comm:
+                    new_comments.append(comm)
+                    pairs.append((r, comm))
+
+            if deep:
+                await expand_page_replies(bvid, aid, pairs, credential, sub_semaphore)
+
+            if reached or len(new_comments) >= max_comments:
+                break
+
+    except Exception as e:
+        print(f"增量更新BV号 {bvid} 评论时发生错误: {str(e)}")
+        traceback.print_exc()
+        raise
+    finally:
+        await pages.aclose()
+
+    merged = merge_comments(new_comments, existing)
+    print(f"BV号 {bvid} 评论增量更新完成，新增{len(merged) - len(existing)}条，共{len(merged)}条评论")
+    return merged
+
+
+async def get_cid(bvid):
     """通过BV号获取视频cid"""
-    url = "https://api.bilibili.com/x/player/pagelist"
-    params = {
-        "bvid": bvid,
-        "jsonp": "jsonp"
-    }
-    response = requests.get(url, params=params, headers=get_random_headers())
-    data = response.json()
+    data = await meta_cache.get_pagelist(bvid)
     # 获取第一个分P的cid
     cid = data['data'][0]['cid']
     return cid
 
 
-def get_video_danmaku(bvid: str):
-    danmaku = []
+async def get_parts(bvid):
+    """
+    获取视频的全部分P
+    :return: [(分P序号, cid, 分P标题, 时长秒数), ...]
+    """
+    data = await meta_cache.get_pagelist(bvid)
+    return [(p.get('page', i), p['cid'], p.get('part', ''), p.get('duration', 0))
+            for i, p in enumerate(data['data'], 1)]
+
+
+# 同时进行的弹幕下载数（XML接口按分P计，分段接口按分段计）
+DANMAKU_CONCURRENCY = 4
+# 分段弹幕接口：地址（可替换为本地测试服务器）、每段时长（秒）、是否默认使用分段接口
+DANMAKU_SEGMENT_URL = "https://api.bilibili.com/x/v2/dm/web/seg.so"
+DANMAKU_SEGMENT_SECONDS = 360
+DANMAKU_SEGMENTED = True
+
+
+async def fetch_part_danmaku(bvid, part, cid, semaphore):
+    """
+    获取一个分P的弹幕，边下载边解析
+    :return: DanmakuStore（每条弹幕标记为该分P），失败时为空
+    """
+    parser = DanmakuXmlParser(DanmakuStore(part=part))
+    # 启用归档时才保留完整的XML
+    raw = bytearray() if raw_archive is not None else None
+    async with semaphore:
+        try:
+            xml_url = f"https://api.bilibili.com/x/v1/dm/list.so?oid={cid}"
+            async for chunk in fetch_chunks(xml_url):
+                parser.feed(chunk)
+                if raw is not None:
+                    raw += chunk
+            store = parser.close()
+            if raw is not None:
+                archive_payload(bvid, 'dm', part, raw)
+            return store
+        except Exception as e:
+            print(f"获取BV号 {bvid} 第{part}P弹幕失败: {str(e)}")
+    return DanmakuStore(part=part)
+
+
+async def fetch_danmaku_segment(cid, index, semaphore, base_url=DANMAKU_SEGMENT_URL):
+    """
+    下载一段（6分钟）protobuf弹幕
+    :param index: 分段序号（从1开始）
+    :return: 接口返回的二进制内容
+    """
+    params = {"type": 1, "oid": cid, "segment_index": index}
+    async with semaphore:
+        data = await fetch_bytes(base_url, params=params)
+    # 出错时接口返回的是JSON
+    if data[:1] == b'{':
+        raise RuntimeError(json.loads(data).get('message', data[:200]))
+    return data
+
+
+async def fetch_part_danmaku_segmented(bvid, part, cid, duration, semaphore, base_url=DANMAKU_SEGMENT_URL):
+    """
+    通过分段接口获取一个分P的全部弹幕，各分段并发下载，按分段顺序解码
+    :param duration: 分P时长（秒），决定分段数
+    :param semaphore: 限制同时下载的分段数
+    :return: DanmakuStore（每条弹幕标记为该分P）；有分段失败时改用XML接口获取整个分P，不保存缺少时间段的结果
+    """
+    segments = max(1, -(-int(duration or 0) // DANMAKU_SEGMENT_SECONDS))
+    results = await asyncio.gather(
+        *(fetch_danmaku_segment(cid, index, semaphore, base_url) for index in range(1, segments + 1)),
+        return_exceptions=True,
+    )
+
+    store = DanmakuStore(part=part)
+    failed = 0
+    for index, data in enumerate(results, 1):
+        if isinstance(data, Exception):
+            print(f"获取BV号 {bvid} 第{part}P第{index}/{segments}段弹幕失败: {str(data)}")
+            failed += 1
+            continue
+        archive_payload(bvid, 'dm_seg', f"{part}:{index}", data)
+        try:
+            parse_danmaku_segment(data, store)
+        except Exception as e:
+            print(f"解析BV号 {bvid} 第{part}P第{index}/{segments}段弹幕失败: {str(e)}")
+            failed += 1
+
+    if failed:
+        # 缺少的时间段无法单独补齐（接口变化、鉴权失败、限流等），整个分P改用XML接口获取
+        print(f"BV号 {bvid} 第{part}P有{failed}/{segments}段弹幕失败，改用XML接口")
+        return await fetch_part_danmaku(bvid, part, cid, semaphore)
+    return store
+
+
+async def iter_video_danmaku(bvid, concurrency=DANMAKU_CONCURRENCY, segmented=DANMAKU_SEGMENTED,
+                             base_url=DANMAKU_SEGMENT_URL):
+    """
+    并发获取所有分P的弹幕，哪个分P先完成先产出
+    :param concurrency: 同时下载数（XML接口为分P数，分段接口为分段数）
+    :param segmented: True使用分段protobuf接口（完整弹幕），False使用XML接口（热门视频只返回部分弹幕）
+    :param base_url: 分段接口地址
+    :return: 异步生成器，产出 (分P序号, 分P标题, DanmakuStore)
+    """
+    parts = await get_parts(bvid)
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = {}
+    for part, cid, title, duration in parts:
+        if segmented:
+            coro = fetch_part_danmaku_segmented(bvid, part, cid, duration, semaphore, base_url)
+        else:
+            coro = fetch_part_danmaku(bvid, part, cid, semaphore)
+        tasks[asyncio.ensure_future(coro)] = (part, title)
+
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                part, title = tasks[task]
+                store = task.result()
+                if len(parts) > 1:
+                    print(f"BV号 {bvid} 第{part}/{len(parts)}P弹幕获取完成，共{len(store)}条")
+                yield part, title, store
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def get_video_danmaku(bvid: str, concurrency=DANMAKU_CONCURRENCY, segmented=DANMAKU_SEGMENTED):
+    """
+    获取视频全部分P的弹幕，每条弹幕的属性全部解码
+    :return: DanmakuStore（按分P顺序合并，part列为所属分P），失败时为空
+    """
+    danmaku = DanmakuStore()
+    parts = iter_video_danmaku(bvid, concurrency, segmented)
     try:
-        # 增加延迟
-        time.sleep(random.uniform(1, 3))
-
-        url = f"https://api.bilibili.com/x/player/pagelist?bvid={bvid}&jsonp=jsonp"
-        cid = requests.get(url, headers=get_random_headers()).json()["data"][0]["cid"]
-
-        xml_url = f"https://api.bilibili.com/x/v1/dm/list.so?oid={cid}"
-        response = requests.get(xml_url, headers=get_random_headers())
-        response.encoding = "utf-8"
-        root = ET.fromstring(response.text)
-        for d in root.findall("d"):
-            danmaku.append(d.text)
+        finished = {}
+        async for part, _, store in parts:
+            finished[part] = store
+        for part in sorted(finished):
+            danmaku.extend(finished[part])
     except Exception as e:
         print(f"获取BV号 {bvid} 弹幕失败: {str(e)}")
+    finally:
+        await parts.aclose()
     return danmaku
 
 
-def get_video_info(bvid):
+async def stream_video_danmaku(bvid: str, sink, concurrency=DANMAKU_CONCURRENCY, segmented=DANMAKU_SEGMENTED):
     """
-    通过bvid获取B站视频信息
+    边下载边写入：每个分P的弹幕下载完成后立即交给sink，不等待其他分P，内存中只保留在途的分P
+    :param sink: 具有 write_danmaku_part(分P序号, 分P标题, DanmakuStore) 方法的对象
+    :return: 写入的弹幕数
     """
-    # 增加延迟
-    time.sleep(random.uniform(1, 3))
+    count = 0
+    parts = iter_video_danmaku(bvid, concurrency, segmented)
+    try:
+        async for part, title, store in parts:
+            sink.write_danmaku_part(part, title, store)
+            count += len(store)
+    finally:
+        await parts.aclose()
+    return count
 
-    url = f"https://api.bilibili.com/x/web-interface/view?bvid={bvid}"
 
+async def get_video_info(bvid):
+    """
+    通过bvid获取B站视频信息
+    """
     try:
-        response = requests.get(url, headers=get_random_headers())
-        response.raise_for_status()
-        json_data = response.json()
+        json_data = await meta_cache.get_view(bvid)
 
         if json_data['code'] == 0:
             data = json_data['data']
@@ -255,39 +934,300 @@ def get_video_info(bvid):
 
 async def get_video_stats(bvid):
     try:
-        # 实例化Video对象
-        v = video.Video(bvid=bvid)
-        # 获取视频信息
-        info = await v.get_info()
+        # 与get_video_info共用同一次view请求
+        json_data = await meta_cache.get_view(bvid)
+        if json_data['code'] != 0:
+            print(f"BV号 {bvid} API返回错误: {json_data['message']}")
+            return {}
         # 提取播放量和评论数
-        stat = info['stat']
+        stat = json_data['data']['stat']
         return stat
     except Exception as e:
         print(f"获取BV号 {bvid} 统计信息失败: {str(e)}")
         return {}
 
 
-def save_to_csv(data, bvid):
-    output_dir = ensure_dir_exists()
-    path = os.path.join(output_dir, f"BVID_{bvid}.xlsx")
+async def crawl_video(bvid, credential=None, journal=None, existing_comments=None, deep=False, comment_sink=None,
+                      danmaku_sink=None):
+    """
+    并发获取一个视频的评论、弹幕、基本信息和统计数据，合并为save_to_csv使用的字典
+    各项互不等待，某一项失败时该项为空值，不影响其他项
+    :param journal: ProgressJournal，用于评论抓取的断点续传
+    :param existing_comments: 已保存的评论，给定时评论改为增量更新
+    :param deep: 是否展开每条评论下的全部回复
+    :param comment_sink: 给定时评论逐页写入该sink，不在内存中保留（结果中comments为None）
+    :param danmaku_sink: 给定时每个分P的弹幕下载完成后写入该sink，不在内存中合并（结果中danmaku为None）
+    :return: 结果字典，complete为False表示评论没有获取完整（如某页重试次数用尽），不应保存或标记完成
+    """
+    if existing_comments is not None:
+        comments_task = refresh_video_comments(bvid, existing_comments, credential, deep=deep)
+    elif comment_sink is not None:
+        comments_task = stream_video_comments(bvid, comment_sink, credential, journal=journal, deep=deep)
+    else:
+        comments_task = get_video_comments(bvid, credential, journal=journal, deep=deep)
+    streaming = existing_comments is None and comment_sink is not None
+    if danmaku_sink is not None:
+        danmaku_task = stream_video_danmaku(bvid, danmaku_sink)
+    else:
+        danmaku_task = get_video_danmaku(bvid)
+
+    names = ('评论', '弹幕', '视频信息', '统计数据')
+    defaults = (0 if streaming else [], 0 if danmaku_sink is not None else DanmakuStore(), (None, None), {})
+    results = await asyncio.gather(
+        comments_task,
+        danmaku_task,
+        get_video_info(bvid),
+        get_video_stats(bvid),
+        return_exceptions=True,
+    )
+
+    values = []
+    for name, default, result in zip(names, defaults, results):
+        if isinstance(result, Exception):
+            print(f"BV号 {bvid} 获取{name}失败: {str(result)}")
+            result = default
+        values.append(result)
+
+    comments, danmaku, (title, description), stat = values
+    if streaming:
+        comment_count, comments = comments, None
+    else:
+        comment_count = len(comments)
+    if danmaku_sink is not None:
+        danmaku_count, danmaku = danmaku, None
+    else:
+        danmaku_count = len(danmaku)
+    return {
+        "comments": comments,
+        "comment_count": comment_count,
+        "danmaku": danmaku,
+        "danmaku_count": danmaku_count,
+        "title": title,
+        "description": description,
+        "stat": stat,
+        "complete": not isinstance(results[0], Exception),
+    }
+
+
+def reparse_comments(archive, bvid, deep=False):
+    """
+    从归档的评论页重新解析评论，已归档的楼中楼分页会替换评论自带的预览回复；
+    增量更新时按时间排序抓取的页面（各次写入）解析出的评论排在前面，按rpid去重
+    :param deep: 与抓取时的深度模式一致，没有归档回复分页的评论也按深度模式的格式整理预览回复
+    :return: 评论列表
+    """
+    # 根评论rpid -> 已归档的回复页码
+    sub_pages = {}
+    for page in archive.pages(bvid, 'sub_reply'):
+        sub_pages.setdefault(int(str(page).split(':')[0]), []).append(page)
+
+    def parse_page(res):
+        page_comments = []
+        for r in (res or {}).get("replies") or []:
+            comm = parse_comment(r)
+            if not comm:
+                continue
+            page_comments.append(comm)
+            pages = sub_pages.get(r.get("rpid"))
+            if pages:
+                sub_replies = []
+                seen = set()
+                for page in pages:
+                    for reply in json.loads(archive.get(bvid, 'sub_reply', page)).get("replies") or []:
+                        item = parse_sub_reply(reply)
+                        if item and item['rpid'] not in seen:
+                            seen.add(item['rpid'])
+                            sub_replies.append(item)
+            elif deep:
+                sub_replies = [item for item in map(parse_sub_reply, r.get("replies") or []) if item]
+            else:
+                continue
+            comm['reply'] = [f"{item['uname']}: {item['message']}" for item in sub_replies]
+            comm['sub_replies'] = sub_replies
+        return page_comments
+
+    comments = []
+    for page in archive.pages(bvid, 'reply'):
+        comments.extend(parse_page(archive.get_json(bvid, 'reply', page)))
+
+    new_comments = []
+    for page in archive.pages(bvid, 'reply_time'):
+        # 后写入的（较新的）增量更新排在前面
+        for data in reversed(archive.versions(bvid, 'reply_time', page)):
+            new_comments.extend(parse_page(json.loads(data)))
+    return merge_comments(new_comments, comments)
+
+
+def reparse_danmaku(archive, bvid):
+    """
+    从归档的pagelist和各分P的弹幕（分段protobuf优先，其次XML）重新解析弹幕
+    :return: DanmakuStore（按分P顺序合并）
+    """
+    danmaku = DanmakuStore()
+    pagelist = archive.get_json(bvid, 'pagelist')
+    if not pagelist or pagelist.get('code') != 0:
+        return danmaku
+
+    segment_pages = archive.pages(bvid, 'dm_seg')
+    for i, p in enumerate(pagelist['data'], 1):
+        part = p.get('page', i)
+        store = DanmakuStore(part=part)
+        segments = [page for page in segment_pages if str(page).split(':')[0] == str(part)]
+        if segments:
+            for page in segments:
+                try:
+                    parse_danmaku_segment(archive.get(bvid, 'dm_seg', page), store)
+                except Exception as e:
+                    print(f"解析BV号 {bvid} 第{part}P归档的分段弹幕{page}失败: {str(e)}")
+        elif (bvid, 'dm', part) in archive:
+            parser = DanmakuXmlParser(store)
+            parser.feed(archive.get(bvid, 'dm', part))
+            store = parser.close()
+        danmaku.extend(store)
+    return danmaku
+
+
+def reparse_video(archive, bvid, deep=False):
+    """
+    不访问网络，从原始响应归档重新解析一个视频，修改解析函数后可据此补全新字段
+    :param archive: RawArchive
+    :param deep: 抓取时是否使用了深度模式
+    :return: 与crawl_video格式相同的字典
+    """
+    comments = reparse_comments(archive, bvid, deep)
+    danmaku = reparse_danmaku(archive, bvid)
+    title, description, stat = None, None, {}
+    view = archive.get_json(bvid, 'view')
+    if view and view.get('code') == 0:
+        title = view['data']['title']
+        description = view['data']['desc']
+        stat = view['data']['stat']
+    return {
+        "comments": comments,
+        "comment_count": len(comments),
+        "danmaku": danmaku,
+        "danmaku_count": len(danmaku),
+        "complete": True,
+        "title": title,
+        "description": description,
+        "stat": stat,
+    }
+
+
+def load_saved_comments(bvid):
+    """
+    读取已保存的Excel文件中的评论表（超过行数上限时续写的"评论(2)"等表一并读取）
+    :return: 评论列表，文件不存在时返回None
+    """
+    path = os.path.join(OUTPUT_DIR, f"BVID_{bvid}.xlsx")
+    if not os.path.exists(path):
+        return None
+
+    sheets = pd.read_excel(path, sheet_name=None)
+    # 评论、评论(2)、评论(3)……按续写顺序拼接
+    parts = []
+    for name, df in sheets.items():
+        match = re.fullmatch(r'评论(?:\((\d+)\))?', name)
+        if match:
+            parts.append((int(match.group(1) or 1), df))
+    parts.sort(key=lambda part: part[0])
+    rows = [row for _, df in parts for row in df.to_dict('records')]
+    comments = []
+    for row in rows:
+        comm = {'comment': row.get('comment')}
+        # Excel中列表保存为其字符串形式
+        for key in ('reply', 'sub_replies'):
+            value = row.get(key)
+            if isinstance(value, str):
+                try:
+                    value = ast.literal_eval(value)
+                except (ValueError, SyntaxError):
+                    value = [value] if key == 'reply' else []
+            comm[key] = value if isinstance(value, list) else []
+        for key in ('rpid', 'ctime', 'mid', 'like'):
+            value = row.get(key)
+            comm[key] = int(value) if value is not None and pd.notna(value) else None
+        uname = row.get('uname')
+        comm['uname'] = uname if isinstance(uname, str) else None
+        comments.append(comm)
+    return comments
+
+
+def workbook_path(bvid):
+    return os.path.join(ensure_dir_exists(), f"BVID_{bvid}.xlsx")
+
+
+def save_to_csv(data, bvid, workbook=None):
+    """
+    以只写模式逐行生成 BVID_<视频ID>.xlsx（评论、弹幕、视频信息、统计数据四个表，超过Excel行数上限时自动分表）
+    :param data: crawl_video的结果，comments、danmaku为None时已通过workbook逐页（逐个分P）写入
+    :param workbook: 抓取评论时作为sink使用的VideoWorkbook，为None时新建
+    :return: 是否保存成功
+    """
+    path = workbook_path(bvid)
 
     try:
-        df1 = pd.DataFrame(data['comments'])
-        df2 = pd.DataFrame(data['danmaku'], columns=['弹幕内容'])
-        df3 = pd.DataFrame([{'标题': data['title'], '描述': data['description']}])
-        df4 = pd.DataFrame([data['stat']])
-
-        with pd.ExcelWriter(path) as writer:
-            df1.to_excel(writer, sheet_name='评论', index=False)
-            df2.to_excel(writer, sheet_name='弹幕', index=False)
-            df3.to_excel(writer, sheet_name='视频信息', index=False)
-            df4.to_excel(writer, sheet_name='统计数据', index=False)
+        if workbook is None:
+            workbook = VideoWorkbook(path)
+        workbook.write_video(data)
+        workbook.save()
         print(f"BV号 {bvid} 数据已保存至: {path}")
+        return True
     except Exception as e:
         print(f"保存BV号 {bvid} 数据失败: {str(e)}")
+        return False
 
 
-if __name__ == "__main__":
+# 进度日志文件名（位于输出目录中），删除该文件即可从头重新爬取；增量更新按日期使用单独的日志
+JOURNAL_FILE = 'progress.jsonl'
+REFRESH_JOURNAL_FILE = 'progress_refresh_{date}.jsonl'
+# 分区数据集目录（位于输出目录中）
+DATASET_DIR = 'dataset'
+# 原始响应归档目录（位于输出目录中）
+ARCHIVE_DIR = 'raw'
+
+
+def reparse_archive(dataset=False, deep=False):
+    """
+    重新解析模式（命令行参数 --reparse）：不访问网络，从原始响应归档重新生成每个视频的结果
+    :param dataset: 写入分区数据集（分区日期为该视频view接口的归档日期），否则重新生成Excel文件
+    :param deep: 抓取时是否使用了深度模式（命令行参数 --deep）
+    """
+    archive = RawArchive(os.path.join(ensure_dir_exists(), ARCHIVE_DIR), train_samples=0)
+    bvids = archive.bvids()
+    print(f"开始重新解析归档，共{len(bvids)}个视频")
+    try:
+        for i, bvid in enumerate(bvids, 1):
+            try:
+                res = reparse_video(archive, bvid, deep)
+                if dataset:
+                    record = archive.record(bvid, 'view') or archive.record(bvid, 'reply', 1)
+                    crawl_date = date.fromtimestamp(record['fetched']) if record else None
+                    DatasetSink(os.path.join(ensure_dir_exists(), DATASET_DIR), crawl_date).write_video(bvid, res)
+                else:
+                    save_to_csv(res, bvid)
+                print(f"第{i}/{len(bvids)}个视频 {bvid} 重新解析完成 - 评论数: {res['comment_count']}, "
+                      f"弹幕数: {res['danmaku_count']}")
+            except Exception as e:
+                print(f"重新解析BV号 {bvid} 时发生错误: {str(e)}")
+                traceback.print_exc()
+    finally:
+        archive.close()
+
+
+async def main(refresh=False, deep=False, stream=False, dataset=False, archive=False):
+    """
+    整个批量任务运行在同一个事件循环中，bilibili_api和共享HTTP会话的连接在视频之间复用
+    进度写入输出目录下的进度日志，中断后重新运行会跳过已完成的视频，未完成视频的评论从中断处继续
+    :param refresh: 增量更新模式（命令行参数 --refresh），已保存过的视频只抓取新增评论并合并
+    :param deep: 深度模式（命令行参数 --deep），展开每条评论下的全部回复
+    :param stream: 流式模式（命令行参数 --stream），评论逐页、弹幕逐个分P写入Excel工作簿（或数据集），不在内存中累积
+    :param dataset: 数据集模式（命令行参数 --dataset），结果写入按日期分区的parquet数据集而不是Excel文件，
+                    与--stream同时使用时评论逐页写入数据集
+    :param archive: 归档模式（命令行参数 --archive），各接口的原始响应压缩后写入输出目录下的归档，
+                    之后可用 --reparse 不联网重新解析
+    """
+    global raw_archive
     # 这里需要你提供获取所有BV号的函数
 
     root = os.getcwd()
@@ -304,34 +1244,81 @@ if __name__ == "__main__":
     print(f"开始爬取，共{len(all_bvids)}个视频")
 
     credential = get_credentials()
+    journal_file = REFRESH_JOURNAL_FILE.format(date=date.today().strftime('%Y%m%d')) if refresh else JOURNAL_FILE
+    journal = ProgressJournal(os.path.join(ensure_dir_exists(), journal_file))
+    finished = sum(1 for bvid in all_bvids if journal.is_done(bvid))
+    if finished:
+        print(f"进度日志中已有{finished}个视频处理完成，将跳过")
+    sink_dataset = DatasetSink(os.path.join(ensure_dir_exists(), DATASET_DIR)) if dataset else None
+    if archive:
+        raw_archive = RawArchive(os.path.join(ensure_dir_exists(), ARCHIVE_DIR))
 
-    for i, bvid in enumerate(all_bvids, 1):
-        print(f"\n正在处理第{i}/{len(all_bvids)}个视频: {bvid}")
-
-        try:
-            comments = get_video_comments(bvid, credential)
-            danmaku = get_video_danmaku(bvid)
-            title, description = get_video_info(bvid)
-            stat = asyncio.run(get_video_stats(bvid))
-
-            res = {
-                "comments": comments,
-                "danmaku": danmaku,
-                "title": title,
-                "description": description,
-                "stat": stat,
-            }
-            save_to_csv(res, bvid)
-            print(f"BV号 {bvid} 处理完成 - 评论数: {len(comments)}, 弹幕数: {len(danmaku)}")
+    try:
+        for i, bvid in enumerate(all_bvids, 1):
+            if journal.is_done(bvid):
+                continue
+            print(f"\n正在处理第{i}/{len(all_bvids)}个视频: {bvid}")
 
-        except Exception as e:
-            print(f"处理BV号 {bvid} 时发生严重错误: {str(e)}")
-            traceback.print_exc()
+            sink = None
+            danmaku_sink = None
+            try:
+                existing = None
+                if refresh:
+                    existing = sink_dataset.load_comments(bvid) if sink_dataset is not None else load_saved_comments(bvid)
+                if stream:
+                    if sink_dataset is not None:
+                        # 增量更新时评论需要与已保存的评论合并，不逐页写入
+                        sink = sink_dataset.comment_writer(bvid) if existing is None else None
+                        danmaku_sink = sink_dataset.danmaku_writer(bvid)
+                    else:
+                        # 同一个工作簿同时接收评论和弹幕
+                        danmaku_sink = VideoWorkbook(workbook_path(bvid))
+                        sink = danmaku_sink if existing is None else None
+                res = await crawl_video(bvid, credential, journal, existing, deep, sink, danmaku_sink)
+                if not res['complete']:
+                    # 不保存也不标记完成，下次运行时从进度日志中断的页码继续
+                    print(f"BV号 {bvid} 评论没有获取完整，暂不保存，下次运行时继续")
+                else:
+                    if sink_dataset is not None:
+                        # 抓取完整后才发布逐页写入的分区
+                        for writer in (sink, danmaku_sink):
+                            if writer is not None:
+                                writer.commit()
+                        saved = sink_dataset.write_video(bvid, res)
+                    else:
+                        saved = save_to_csv(res, bvid, danmaku_sink)
+                    if saved:
+                        journal.record_done(bvid)
+                    print(f"BV号 {bvid} 处理完成 - 评论数: {res['comment_count']}, 弹幕数: {res['danmaku_count']}")
 
-        # 视频间的延迟
-        if i < len(all_bvids):
-            delay = random.uniform(10, 20)  # 10-20秒随机延迟
-            print(f"等待{delay:.1f}秒后处理下一个视频...")
-            time.sleep(delay)
+            except Exception as e:
+                print(f"处理BV号 {bvid} 时发生严重错误: {str(e)}")
+                traceback.print_exc()
+            finally:
+                # 没有commit的分区（抓取失败或评论不完整）删除临时文件，不登记到清单
+                for writer in (sink, danmaku_sink):
+                    if writer is not None:
+                        writer.abort()
+
+            # 视频间的延迟
+            if i < len(all_bvids):
+                delay = random.uniform(10, 20)  # 10-20秒随机延迟
+                print(f"等待{delay:.1f}秒后处理下一个视频...")
+                await asyncio.sleep(delay)
+    finally:
+        journal.close()
+        await close_http_session()
+        if raw_archive is not None:
+            raw_archive.close()
+            raw_archive = None
 
     print("\n所有视频处理完成！")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if '--reparse' in args:
+        reparse_archive(dataset='--dataset' in args, deep='--deep' in args)
+    else:
+        asyncio.run(main(refresh='--refresh' in args, deep='--deep' in args, stream='--stream' in args,
+                         dataset='--dataset' in args, archive='--archive' in args))
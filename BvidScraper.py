@@ -7,9 +7,18 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 
+from ResourcePolicy import DEFAULT_BLOCKED_RESOURCES, ResourceReport, apply_blocked_resources, configure_options
+
 
 class BilibiliRankingCrawler:
-    def __init__(self):
+    def __init__(self, block_resources=DEFAULT_BLOCKED_RESOURCES, page_load_strategy='eager'):
+        """
+        :param block_resources: 需要拦截的资源类别（media/images/fonts/analytics），传入空元组则不拦截
+        :param page_load_strategy: 页面加载策略，eager不等待图片等子资源
+        """
+        self.block_resources = tuple(block_resources or ())
+        self.page_load_strategy = page_load_strategy
+        self.resource_report = ResourceReport()
         self.setup_driver()
         self.base_url = "https://www.bilibili.com/v/popular/rank/tech"
 
@@ -34,8 +43,12 @@ class BilibiliRankingCrawler:
         ]
         chrome_options.add_argument(f'--user-agent={random.choice(user_agents)}')
 
+        # 页面加载策略和资源拦截（只需要排行榜中的链接）
+        configure_options(chrome_options, self.page_load_strategy)
+
         # 初始化浏览器
         self.driver = webdriver.Chrome(options=chrome_options)
+        apply_blocked_resources(self.driver, self.block_resources)
 
         # 执行脚本隐藏webdriver属性
         self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
@@ -139,6 +152,13 @@ class BilibiliRankingCrawler:
                 print("未能获取到任何BV号")
 
         finally:
+            # 统计本次运行的资源加载与拦截情况
+            try:
+                self.resource_report.consume(self.driver.get_log('performance'))
+                self.resource_report.finish_run()
+            except Exception as e:
+                print(f"读取资源统计时出错: {str(e)}")
+
             # 关闭浏览器
             self.driver.quit()
             print("\n浏览器已关闭")
@@ -0,0 +1,201 @@
+"""
+评论树列式存储
+
+每条评论（包括楼中楼回复）占一行，整数字段按列存放在 array.array 中：
+    rpid 评论ID, oid 视频aid, root 根评论ID（根评论为0）, parent 父评论ID（根评论为0）,
+    mid 作者ID, like 点赞数, ctime 发布时间戳, uname 作者昵称在昵称表中的序号
+评论内容统一存放在一个UTF-8缓冲区里，昵称去重后只保存一份。
+按rpid查找行、查找父评论为O(1)；子评论和整楼回复通过按需构建的分组索引（每次追加后重建）O(1)取出。
+"""
+from array import array
+
+import numpy as np
+
+# 列名 -> array类型码（与NumPy的dtype字符一致）
+COMMENT_FIELDS = (
+    ('rpid', 'q'),
+    ('oid', 'q'),
+    ('root', 'q'),
+    ('parent', 'q'),
+    ('mid', 'q'),
+    ('like', 'q'),
+    ('ctime', 'q'),
+    ('uname', 'I'),
+)
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class CommentStore:
+    """按列存放一个或多个视频的评论树，同一rpid只保存一次"""
+
+    def __init__(self, oid=0):
+        """
+        :param oid: 未单独指定时，追加的评论所属视频的aid
+        """
+        self.default_oid = oid
+        for name, typecode in COMMENT_FIELDS:
+            setattr(self, name, array(typecode))
+        # 第i条评论的内容为 _text[text_offsets[i]:text_offsets[i + 1]]
+        self._text = bytearray()
+        self.text_offsets = array('q', [0])
+        self.unames = []
+        self._uname_ids = {}
+        # rpid -> 行号
+        self._rows = {}
+        # 分组索引缓存：列名 -> (排序后的行号, 每个分组在其中的起止位置)，追加后失效
+        self._groups = {}
+
+    def __len__(self):
+        return len(self.rpid)
+
+    def __contains__(self, rpid):
+        return rpid in self._rows
+
+    def append(self, rpid, root, parent, mid, uname, like, ctime, message, oid=None):
+        """
+        追加一条评论，rpid已存在时忽略
+        :return: 是否追加
+        """
+        if rpid in self._rows:
+            return False
+        uname_id = self._uname_ids.get(uname)
+        if uname_id is None:
+            uname_id = self._uname_ids[uname] = len(self.unames)
+            self.unames.append(uname)
+
+        self._rows[rpid] = len(self.rpid)
+        self.rpid.append(rpid)
+        self.oid.append(self.default_oid if oid is None else oid)
+        self.root.append(root)
+        self.parent.append(parent)
+        self.mid.append(mid)
+        self.like.append(like)
+        self.ctime.append(ctime)
+        self.uname.append(uname_id)
+        self._text += (message or '').encode('utf-8')
+        self.text_offsets.append(len(self._text))
+        self._groups.clear()
+        return True
+
+    def add_comment(self, comm):
+        """
+        追加parse_comment产生的一条评论及其sub_replies中的回复
+        :return: 新增的行数
+        """
+        if comm.get('rpid') is None:
+            return 0
+        added = self.append(_as_int(comm['rpid']), 0, 0, _as_int(comm.get('mid')), comm.get('uname', ''),
+                            _as_int(comm.get('like')), _as_int(comm.get('ctime')), comm.get('comment'))
+        for item in comm.get('sub_replies') or []:
+            if item.get('rpid') is None:
+                continue
+            added += self.append(_as_int(item['rpid']), _as_int(item.get('root')), _as_int(item.get('parent')),
+                                 _as_int(item.get('mid')), item.get('uname', ''), _as_int(item.get('like')),
+                                 _as_int(item.get('ctime')), item.get('message'))
+        return added
+
+    def write_page(self, page, comments):
+        """作为stream_video_comments的sink使用：追加一页评论"""
+        for comm in comments:
+            self.add_comment(comm)
+
+    def row_of(self, rpid):
+        """rpid对应的行号，不存在时返回None"""
+        return self._rows.get(rpid)
+
+    def message(self, row):
+        """第row行的评论内容"""
+        return self._text[self.text_offsets[row]:self.text_offsets[row + 1]].decode('utf-8')
+
+    def author(self, row):
+        """第row行的作者昵称"""
+        return self.unames[self.uname[row]]
+
+    def parent_row(self, row):
+        """父评论的行号，根评论或父评论未保存时返回None"""
+        return self._rows.get(self.parent[row]) if self.parent[row] else None
+
+    def root_row(self, row):
+        """所在楼层根评论的行号，本身是根评论时返回自身"""
+        return self._rows.get(self.root[row]) if self.root[row] else row
+
+    def children(self, row):
+        """直接回复第row行的评论的行号"""
+        return self._group('parent', row)
+
+    def thread(self, row):
+        """第row行（根评论）楼层下的全部回复的行号"""
+        return self._group('root', row)
+
+    def _group(self, name, row):
+        if name not in self._groups:
+            self._groups[name] = self._build_group_index(name)
+        order, offsets = self._groups[name]
+        return order[offsets[row]:offsets[row + 1]]
+
+    def _build_group_index(self, name):
+        """
+        按name列（parent或root）指向的行对所有评论分组
+        :return: (按所指行排序后的行号, 每行对应分组的起始位置)，第row行的分组为 order[offsets[row]:offsets[row + 1]]
+        """
+        count = len(self)
+        if not count:
+            return np.zeros(0, dtype=np.int64), np.zeros(2, dtype=np.int64)
+        rpids = self.column('rpid')
+        keys = self.column(name)
+        sorter = np.argsort(rpids)
+        target_rows = sorter[np.minimum(np.searchsorted(rpids, keys, sorter=sorter), count - 1)]
+        found = (keys != 0) & (rpids[target_rows] == keys)
+        # 所指评论不存在（根评论或父评论未保存）的行归入末尾的空分组
+        targets = np.where(found, target_rows, count)
+        order = np.argsort(targets, kind='stable')
+        offsets = np.zeros(count + 2, dtype=np.int64)
+        np.cumsum(np.bincount(targets, minlength=count + 1), out=offsets[1:])
+        return order, offsets
+
+    def column(self, name):
+        """以NumPy数组形式返回一列（复制一次，不受后续追加影响）"""
+        col = getattr(self, name)
+        return np.frombuffer(col.tobytes(), dtype=col.typecode)
+
+    def select(self, min_like=None, since=None, until=None, roots_only=False, mid=None):
+        """
+        向量化筛选
+        :param min_like: 点赞数不少于该值
+        :param since: 发布时间戳不早于该值
+        :param until: 发布时间戳早于该值
+        :param roots_only: 只保留根评论
+        :param mid: 只保留该作者的评论
+        :return: 满足全部条件的行号（NumPy数组）
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if min_like is not None:
+            mask &= self.column('like') >= min_like
+        if since is not None or until is not None:
+            ctime = self.column('ctime')
+            if since is not None:
+                mask &= ctime >= since
+            if until is not None:
+                mask &= ctime < until
+        if roots_only:
+            mask &= self.column('root') == 0
+        if mid is not None:
+            mask &= self.column('mid') == mid
+        return np.flatnonzero(mask)
+
+    def to_numpy(self):
+        """
+        转换为NumPy结构化数组（不含评论内容）
+        :return: 每条评论一行，字段与COMMENT_FIELDS一致
+        """
+        dtype = np.dtype([(name, typecode) for name, typecode in COMMENT_FIELDS])
+        records = np.empty(len(self), dtype=dtype)
+        for name, _ in COMMENT_FIELDS:
+            records[name] = self.column(name)
+        return records
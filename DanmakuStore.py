@@ -0,0 +1,312 @@
+"""
+弹幕列式存储与流式XML解析
+
+弹幕接口（x/v1/dm/list.so）返回的每条 <d> 元素的 p 属性依次为：
+出现时间(秒), 模式, 字号, 颜色, 发送时间戳, 弹幕池, 发送者ID哈希, 弹幕ID, 权重(可能缺失)
+DanmakuStore 把这些字段解码后按列存放在 array.array 中，文本统一存放在一个UTF-8缓冲区里，
+每条弹幕只占几十个字节，需要分析时再整体转换为 NumPy 数组。
+分段弹幕接口（x/v2/dm/web/seg.so）返回的protobuf由 parse_danmaku_segment 解码到同样的列中。
+"""
+from array import array
+from xml.etree import ElementTree as ET
+
+import numpy as np
+
+# 列名 -> array类型码（与NumPy的dtype字符一致）
+DANMAKU_FIELDS = (
+    ('progress', 'd'),   # 出现时间（秒）
+    ('mode', 'B'),       # 模式：1-3滚动 4底部 5顶部 6逆向 7高级 8代码 9BAS
+    ('fontsize', 'H'),   # 字号
+    ('color', 'I'),      # 颜色（十进制RGB）
+    ('ctime', 'q'),      # 发送时间戳（秒）
+    ('pool', 'B'),       # 弹幕池：0普通 1字幕 2特殊
+    ('mid_hash', 'I'),   # 发送者ID的CRC32哈希
+    ('dmid', 'q'),       # 弹幕ID
+    ('weight', 'B'),     # 屏蔽权重，接口未返回时为0
+    ('part', 'H'),       # 所属分P（从1开始）
+)
+
+
+def _int_range(typecode):
+    """整数类型码可以表示的 (最小值, 最大值, 位数)"""
+    bits = array(typecode).itemsize * 8
+    if typecode.islower():
+        return -(1 << (bits - 1)), (1 << (bits - 1)) - 1, bits
+    return 0, (1 << bits) - 1, bits
+
+
+# 列名 -> 整数列的取值范围，浮点列为None
+_FIELD_RANGES = {name: None if typecode == 'd' else _int_range(typecode) for name, typecode in DANMAKU_FIELDS}
+
+
+def _fit(value, field_range):
+    """
+    把一个值转换为可以写入对应列的值，超出该列类型范围的整数记为0
+    有符号列中按64位无符号读出的负数（protobuf varint）还原为负数
+    """
+    if field_range is None:
+        return float(value)
+    low, high, bits = field_range
+    value = int(value)
+    if low < 0 and high < value < (1 << 64):
+        value -= 1 << 64
+    return value if low <= value <= high else 0
+
+
+def _parse_int(value, base=10):
+    try:
+        return int(value, base)
+    except (TypeError, ValueError):
+        return 0
+
+
+class DanmakuStore:
+    """按列存放一批弹幕"""
+
+    def __init__(self, part=1):
+        """
+        :param part: 未单独指定分P时，追加的弹幕所属的分P
+        """
+        self.default_part = part
+        for name, typecode in DANMAKU_FIELDS:
+            setattr(self, name, array(typecode))
+        # 第i条弹幕的文本为 _text[text_offsets[i]:text_offsets[i + 1]]
+        self._text = bytearray()
+        self.text_offsets = array('q', [0])
+
+    def __len__(self):
+        return len(self.progress)
+
+    def append(self, progress, mode, fontsize, color, ctime, pool, mid_hash, dmid, weight, text, part=None):
+        """
+        追加一条已解码的弹幕
+        所有值先转换为各列可以保存的值（超出范围的整数记为0）再写入，任何一列都不会单独多出一行
+        """
+        row = (progress, mode, fontsize, color, ctime, pool, mid_hash, dmid, weight,
+               self.default_part if part is None else part)
+        values = [_fit(value, _FIELD_RANGES[name]) for (name, _), value in zip(DANMAKU_FIELDS, row)]
+        encoded = (text or '').encode('utf-8', 'replace')
+        for (name, _), value in zip(DANMAKU_FIELDS, values):
+            getattr(self, name).append(value)
+        self._text += encoded
+        self.text_offsets.append(len(self._text))
+
+    def append_xml(self, p, text):
+        """
+        解码一条XML弹幕
+        :param p: <d> 元素的 p 属性
+        :param text: 弹幕文本
+        """
+        parts = p.split(',')
+        parts += [''] * (9 - len(parts))
+        try:
+            progress = float(parts[0])
+        except ValueError:
+            progress = 0.0
+        self.append(
+            progress,
+            _parse_int(parts[1]),
+            _parse_int(parts[2]),
+            _parse_int(parts[3]),
+            _parse_int(parts[4]),
+            _parse_int(parts[5]),
+            _parse_int(parts[6], 16),
+            _parse_int(parts[7]),
+            _parse_int(parts[8]),
+            text,
+        )
+
+    def extend(self, other):
+        """追加另一个DanmakuStore中的全部弹幕"""
+        for name, _ in DANMAKU_FIELDS:
+            getattr(self, name).extend(getattr(other, name))
+        base = len(self._text)
+        self._text += other._text
+        self.text_offsets.extend(offset + base for offset in other.text_offsets[1:])
+
+    def text(self, index):
+        """第index条弹幕的文本"""
+        return self._text[self.text_offsets[index]:self.text_offsets[index + 1]].decode('utf-8')
+
+    def texts(self):
+        """全部弹幕文本列表（与旧版get_video_danmaku的返回值一致）"""
+        return [self.text(i) for i in range(len(self))]
+
+    def column(self, name):
+        """以NumPy数组形式返回一列（复制一次，不受后续追加影响）"""
+        col = getattr(self, name)
+        return np.frombuffer(col.tobytes(), dtype=col.typecode)
+
+    def to_dict(self):
+        """
+        :return: {列名: NumPy数组}，另含 'text' 文本列表
+        """
+        columns = {name: self.column(name) for name, _ in DANMAKU_FIELDS}
+        columns['text'] = self.texts()
+        return columns
+
+    def to_numpy(self):
+        """
+        转换为NumPy结构化数组（不含文本）
+        :return: 每条弹幕一行，字段与DANMAKU_FIELDS一致
+        """
+        dtype = np.dtype([(name, typecode) for name, typecode in DANMAKU_FIELDS])
+        records = np.empty(len(self), dtype=dtype)
+        for name, _ in DANMAKU_FIELDS:
+            records[name] = self.column(name)
+        return records
+
+    def density(self, bin_seconds=1.0, duration=None):
+        """
+        弹幕密度直方图
+        :param bin_seconds: 每个区间的长度（秒）
+        :param duration: 视频时长（秒），给定时直方图覆盖整个视频，末尾没有弹幕的区间计0
+        :return: NumPy数组，第i个元素为 [i*bin_seconds, (i+1)*bin_seconds) 内的弹幕数
+        """
+        bins = (self.column('progress') // bin_seconds).astype(np.int64)
+        minlength = int(-(-duration // bin_seconds)) if duration else 0
+        return np.bincount(bins[bins >= 0], minlength=minlength)
+
+
+# DanmakuElem中用到的字段号 -> 列名（progress为毫秒，content为文本，其余按整数解码）
+SEGMENT_ELEM_FIELDS = {
+    1: 'dmid',
+    2: 'progress',
+    3: 'mode',
+    4: 'fontsize',
+    5: 'color',
+    6: 'mid_hash',
+    7: 'text',
+    8: 'ctime',
+    9: 'weight',
+    11: 'pool',
+}
+
+
+def _read_varint(buf, pos):
+    """
+    读取一个protobuf varint
+    :return: (数值, 新位置)
+    """
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _iter_fields(buf, start=0, end=None):
+    """
+    遍历一段protobuf消息中的字段
+    :return: 生成器，产出 (字段号, 值)；varint字段的值为int，长度分隔字段的值为memoryview，定长字段跳过
+    """
+    end = len(buf) if end is None else end
+    pos = start
+    while pos < end:
+        key, pos = _read_varint(buf, pos)
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = _read_varint(buf, pos)
+            yield field, value
+        elif wire_type == 2:
+            length, pos = _read_varint(buf, pos)
+            yield field, buf[pos:pos + length]
+            pos += length
+        elif wire_type == 1:
+            pos += 8
+        elif wire_type == 5:
+            pos += 4
+        else:
+            raise ValueError(f"不支持的protobuf字段类型: {wire_type}")
+
+
+def parse_danmaku_segment(data, store=None):
+    """
+    解码一个分段弹幕（DmSegMobileReply），其中每个 elems(字段1) 为一条DanmakuElem
+    :param data: 接口返回的二进制内容
+    :param store: 追加到的DanmakuStore，为None时新建
+    :return: DanmakuStore
+    """
+    store = store if store is not None else DanmakuStore()
+    buf = memoryview(data)
+    for field, elem in _iter_fields(buf):
+        if field != 1 or isinstance(elem, int):
+            continue
+        values = {}
+        for elem_field, value in _iter_fields(elem):
+            name = SEGMENT_ELEM_FIELDS.get(elem_field)
+            # 文本字段为长度分隔类型，其余为varint，类型不符的字段忽略
+            if name is not None and isinstance(value, int) != (name in ('mid_hash', 'text')):
+                values[name] = value
+
+        mid_hash = values.get('mid_hash')
+        text = values.get('text')
+        store.append(
+            values.get('progress', 0) / 1000,
+            values.get('mode', 0),
+            values.get('fontsize', 0),
+            values.get('color', 0) & 0xffffffff,
+            values.get('ctime', 0),
+            values.get('pool', 0),
+            _parse_int(bytes(mid_hash).decode('ascii', 'replace'), 16) if mid_hash is not None else 0,
+            values.get('dmid', 0),
+            values.get('weight', 0),
+            bytes(text).decode('utf-8', 'replace') if text is not None else '',
+        )
+    return store
+
+
+class DanmakuXmlParser:
+    """
+    增量解析弹幕XML：分块喂入响应内容，每解析完一个 <d> 元素就写入DanmakuStore并释放该元素
+    """
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else DanmakuStore()
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._root = None
+
+    def feed(self, chunk):
+        """
+        :param chunk: 响应内容的一段（bytes或str）
+        """
+        self._parser.feed(chunk)
+        self._drain()
+
+    def close(self):
+        """
+        结束解析
+        :return: DanmakuStore
+        """
+        self._parser.close()
+        self._drain()
+        return self.store
+
+    def _drain(self):
+        for event, elem in self._parser.read_events():
+            if event == 'start':
+                if self._root is None:
+                    self._root = elem
+                continue
+            if elem.tag != 'd':
+                continue
+            self.store.append_xml(elem.get('p', ''), elem.text)
+            # 已写入列存储，从树中移除以保持内存占用恒定
+            elem.clear()
+            if self._root is not None:
+                self._root.remove(elem)
+
+
+def parse_danmaku_xml(data):
+    """
+    一次性解析完整的弹幕XML
+    :param data: XML内容（bytes或str）
+    :return: DanmakuStore
+    """
+    parser = DanmakuXmlParser()
+    parser.feed(data)
+    return parser.close()
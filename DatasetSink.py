@@ -0,0 +1,288 @@
+"""
+按抓取日期分区的列式数据集
+
+替代每个视频一个Excel文件：评论、弹幕、视频信息、统计数据分别写入
+    <数据集目录>/<表名>/crawl_date=YYYY-MM-DD/<BV号>.parquet
+每写完一个文件就在 manifest.jsonl 中追加一行（表名、日期、BV号、路径、行数），
+跨视频查询时先按清单筛选出相关分区，只读取需要的文件。
+"""
+import os
+import json
+import time
+from datetime import date
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from CommentStore import CommentStore
+from DanmakuStore import DANMAKU_FIELDS
+
+MANIFEST_FILE = 'manifest.jsonl'
+
+COMMENT_SCHEMA = pa.schema([
+    ('bvid', pa.string()),
+    ('rpid', pa.int64()),
+    ('root', pa.int64()),
+    ('parent', pa.int64()),
+    ('mid', pa.int64()),
+    ('uname', pa.string()),
+    ('like', pa.int64()),
+    ('ctime', pa.int64()),
+    ('message', pa.string()),
+])
+
+
+# DanmakuStore的array类型码 -> parquet列类型
+_ARROW_TYPES = {
+    'd': pa.float64(),
+    'B': pa.uint8(),
+    'H': pa.uint16(),
+    'I': pa.uint32(),
+    'q': pa.int64(),
+}
+
+DANMAKU_SCHEMA = pa.schema(
+    [(name, _ARROW_TYPES[typecode]) for name, typecode in DANMAKU_FIELDS]
+    + [('text', pa.string()), ('bvid', pa.string())]
+)
+
+
+def _date_str(value):
+    if value is None or isinstance(value, str):
+        return value
+    return value.strftime('%Y-%m-%d')
+
+
+def comments_to_table(bvid, comments):
+    """
+    将parse_comment格式的评论（含sub_replies中的回复）展开为每条评论一行的表
+    """
+    store = CommentStore()
+    store.write_page(None, comments)
+    count = len(store)
+    return pa.table({
+        'bvid': [bvid] * count,
+        'rpid': store.column('rpid'),
+        'root': store.column('root'),
+        'parent': store.column('parent'),
+        'mid': store.column('mid'),
+        'uname': [store.author(i) for i in range(count)],
+        'like': store.column('like'),
+        'ctime': store.column('ctime'),
+        'message': [store.message(i) for i in range(count)],
+    }, schema=COMMENT_SCHEMA)
+
+
+def danmaku_to_table(bvid, danmaku):
+    """将DanmakuStore转换为每条弹幕一行的表"""
+    columns = danmaku.to_dict()
+    columns['bvid'] = [bvid] * len(danmaku)
+    return pa.table(columns, schema=DANMAKU_SCHEMA)
+
+
+class DatasetSink:
+    """把crawl_video的结果写入分区数据集，并维护清单"""
+
+    def __init__(self, root, crawl_date=None):
+        """
+        :param root: 数据集目录
+        :param crawl_date: 写入的分区日期，默认为当天
+        """
+        self.root = root
+        self.crawl_date = _date_str(crawl_date) or date.today().strftime('%Y-%m-%d')
+        os.makedirs(root, exist_ok=True)
+        self.manifest_path = os.path.join(root, MANIFEST_FILE)
+
+    def partition_path(self, table, bvid, crawl_date=None):
+        """文件在数据集中的相对路径"""
+        return os.path.join(table, f"crawl_date={crawl_date or self.crawl_date}", f"{bvid}.parquet")
+
+    def _temp_path(self, table, bvid):
+        """写入中的临时文件，写完后替换为正式文件，中断时不会留下不完整的分区文件"""
+        path = os.path.join(self.root, self.partition_path(table, bvid))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path + '.tmp'
+
+    def _commit(self, table, bvid, temp_path, rows):
+        relative = self.partition_path(table, bvid)
+        os.replace(temp_path, os.path.join(self.root, relative))
+        record = {'table': table, 'crawl_date': self.crawl_date, 'bvid': bvid,
+                  'path': relative, 'rows': rows, 'created': int(time.time())}
+        with open(self.manifest_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def write_table(self, table, bvid, data):
+        """
+        写入一个视频在某个表中的全部数据
+        :param data: pyarrow.Table
+        """
+        temp_path = self._temp_path(table, bvid)
+        pq.write_table(data, temp_path)
+        self._commit(table, bvid, temp_path, data.num_rows)
+
+    def comment_writer(self, bvid):
+        """
+        :return: 逐页写入评论的sink（可传给stream_video_comments），抓取成功后调用commit()发布，否则调用abort()
+        """
+        return CommentPartitionWriter(self, bvid)
+
+    def danmaku_writer(self, bvid):
+        """
+        :return: 逐个分P写入弹幕的sink（可传给stream_video_danmaku），抓取成功后调用commit()发布，否则调用abort()
+        """
+        return DanmakuPartitionWriter(self, bvid)
+
+    def write_video(self, bvid, data):
+        """
+        写入crawl_video的结果
+        :param data: comments为None时（评论已通过comment_writer写入）不写评论表，danmaku为None时同理
+        :return: 是否写入成功
+        """
+        try:
+            if data['comments'] is not None:
+                self.write_table('comments', bvid, comments_to_table(bvid, data['comments']))
+            if data['danmaku'] is not None:
+                self.write_table('danmaku', bvid, danmaku_to_table(bvid, data['danmaku']))
+            self.write_table('video_info', bvid, pa.Table.from_pylist(
+                [{'bvid': bvid, 'title': data['title'], 'description': data['description']}]))
+            self.write_table('stats', bvid, pa.Table.from_pylist([dict({'bvid': bvid}, **(data['stat'] or {}))]))
+            print(f"BV号 {bvid} 数据已写入数据集: {self.root}（分区 crawl_date={self.crawl_date}）")
+            return True
+        except Exception as e:
+            print(f"写入BV号 {bvid} 数据集失败: {str(e)}")
+            return False
+
+    def manifest(self):
+        """
+        读取清单，同一路径只保留最后一次写入的记录
+        :return: 清单记录列表
+        """
+        if not os.path.exists(self.manifest_path):
+            return []
+        records = {}
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records[record['path']] = record
+        return list(records.values())
+
+    def files(self, table, since=None, until=None, bvids=None):
+        """
+        按清单筛选分区文件
+        :param since: 起始抓取日期（含），date或'YYYY-MM-DD'
+        :param until: 截止抓取日期（含）
+        :param bvids: 只包含这些视频
+        :return: 文件路径列表
+        """
+        since, until = _date_str(since), _date_str(until)
+        bvids = set(bvids) if bvids is not None else None
+        paths = []
+        for record in self.manifest():
+            if record['table'] != table:
+                continue
+            if since is not None and record['crawl_date'] < since:
+                continue
+            if until is not None and record['crawl_date'] > until:
+                continue
+            if bvids is not None and record['bvid'] not in bvids:
+                continue
+            paths.append(os.path.join(self.root, record['path']))
+        return sorted(paths)
+
+    def read(self, table, since=None, until=None, bvids=None, columns=None):
+        """
+        读取一个表在给定日期范围内的数据，只打开清单中符合条件的文件
+        :param columns: 只读取这些列
+        :return: pyarrow.Table（调用to_pandas()可转换为DataFrame），没有数据时返回None
+        """
+        tables = [pq.read_table(path, columns=columns)
+                  for path in self.files(table, since, until, bvids) if os.path.exists(path)]
+        if not tables:
+            return None
+        return pa.concat_tables(tables, promote_options='default')
+
+    def load_comments(self, bvid):
+        """
+        读取一个视频最近一次写入的评论，还原为parse_comment的格式（用于增量更新）
+        :return: 评论列表，数据集中没有该视频时返回None
+        """
+        records = [r for r in self.manifest() if r['table'] == 'comments' and r['bvid'] == bvid]
+        if not records:
+            return None
+        latest = max(records, key=lambda r: (r['crawl_date'], r['created']))
+        rows = pq.read_table(os.path.join(self.root, latest['path'])).to_pylist()
+
+        comments = {}
+        for row in rows:
+            if not row['root']:
+                comments[row['rpid']] = {
+                    'comment': row['message'], 'reply': [], 'rpid': row['rpid'], 'ctime': row['ctime'],
+                    'mid': row['mid'], 'uname': row['uname'], 'like': row['like'], 'sub_replies': [],
+                }
+        for row in rows:
+            comm = comments.get(row['root']) if row['root'] else None
+            if comm is None:
+                continue
+            comm['reply'].append(f"{row['uname']}: {row['message']}")
+            comm['sub_replies'].append({
+                'rpid': row['rpid'], 'root': row['root'], 'parent': row['parent'], 'mid': row['mid'],
+                'uname': row['uname'], 'message': row['message'], 'ctime': row['ctime'], 'like': row['like'],
+            })
+        return list(comments.values())
+
+
+class PartitionWriter:
+    """把一个视频在某个表中的数据分批写入一个分区文件，每批一个row group"""
+
+    def __init__(self, sink, table, bvid, schema):
+        self.sink = sink
+        self.table = table
+        self.bvid = bvid
+        self.count = 0
+        self._temp_path = sink._temp_path(table, bvid)
+        self._writer = pq.ParquetWriter(self._temp_path, schema)
+
+    def write(self, data):
+        """写入一批数据（pyarrow.Table）"""
+        self._writer.write_table(data)
+        self.count += data.num_rows
+
+    def commit(self):
+        """抓取成功后替换为正式文件并登记到清单，重复调用或abort()之后调用无效"""
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._writer = None
+        self.sink._commit(self.table, self.bvid, self._temp_path, self.count)
+
+    def abort(self):
+        """放弃没有commit()的数据：关闭文件并删除临时文件，不登记到清单；commit()之后调用无效"""
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._writer = None
+        if os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+
+
+class CommentPartitionWriter(PartitionWriter):
+    """把评论逐页写入一个分区文件"""
+
+    def __init__(self, sink, bvid):
+        super().__init__(sink, 'comments', bvid, COMMENT_SCHEMA)
+
+    def write_page(self, page, comments):
+        self.write(comments_to_table(self.bvid, comments))
+
+
+class DanmakuPartitionWriter(PartitionWriter):
+    """每个分P的弹幕下载完成后立即写入分区文件"""
+
+    def __init__(self, sink, bvid):
+        super().__init__(sink, 'danmaku', bvid, DANMAKU_SCHEMA)
+
+    def write_danmaku_part(self, part, title, store):
+        self.write(danmaku_to_table(self.bvid, store))
@@ -0,0 +1,183 @@
+"""
+单视频Excel工作簿的流式导出
+
+使用openpyxl只写模式逐行写入，评论可以在抓取过程中逐页写入（VideoWorkbook可直接作为sink），
+不需要先构建完整的DataFrame，内存占用与数据量无关。
+某个表超过Excel的行数上限时自动续写到新的工作表（如 评论、评论(2)、评论(3)）。
+"""
+from datetime import datetime, timezone
+
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+# 单个工作表的最大行数（含表头）
+EXCEL_MAX_ROWS = 1048576
+
+COMMENT_COLUMNS = ('comment', 'reply', 'rpid', 'ctime', 'mid', 'uname', 'like', 'sub_replies')
+
+# 弹幕表的列：DanmakuStore列名 -> Excel列名
+DANMAKU_SHEET_COLUMNS = (
+    ('text', '弹幕内容'),
+    ('part', '分P'),
+    ('progress', '出现时间(秒)'),
+    ('mode', '模式'),
+    ('fontsize', '字号'),
+    ('color', '颜色'),
+    ('ctime', '发送时间'),
+    ('pool', '弹幕池'),
+    ('mid_hash', '用户哈希'),
+    ('dmid', '弹幕ID'),
+    ('weight', '权重'),
+)
+
+# 弹幕按块转换为Python对象，避免一次性展开所有列
+DANMAKU_CHUNK_ROWS = 10000
+
+
+def _cell(value):
+    """转换为可写入单元格的值：列表/字典保存为字符串形式，去掉Excel不允许的控制字符"""
+    if isinstance(value, (list, dict)):
+        value = str(value)
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub('', value)
+    return value
+
+
+class SplitSheet:
+    """只写工作表，写满EXCEL_MAX_ROWS行后在其后新建同名续表，每个续表都带表头"""
+
+    def __init__(self, workbook, title, header=None, max_rows=EXCEL_MAX_ROWS):
+        """
+        :param header: 表头，为None时可在写入数据前通过set_header设置
+        """
+        self.workbook = workbook
+        self.title = title
+        self.header = list(header) if header else []
+        self.max_rows = max_rows
+        self.parts = 0
+        self.rows = 0
+        self._sheet = None
+        self._sheet_rows = 0
+        self._new_sheet()
+
+    def _new_sheet(self):
+        previous = self._sheet
+        self.parts += 1
+        if previous is None:
+            self._sheet = self.workbook.create_sheet(self.title)
+        else:
+            # 续表紧跟在上一部分之后，而不是放到工作簿末尾
+            index = self.workbook.worksheets.index(previous) + 1
+            self._sheet = self.workbook.create_sheet(f"{self.title}({self.parts})", index)
+        self._sheet_rows = 0
+        if self.header:
+            self._sheet.append(self.header)
+            self._sheet_rows = 1
+
+    def set_header(self, header):
+        """设置表头，只能在写入任何数据之前调用"""
+        if self.rows or self.header:
+            raise ValueError(f"工作表 {self.title} 已写入表头或数据")
+        self.header = list(header)
+        self._sheet.append(self.header)
+        self._sheet_rows = 1
+
+    def append(self, row):
+        if self._sheet_rows >= self.max_rows:
+            self._new_sheet()
+        self._sheet.append([_cell(value) for value in row])
+        self._sheet_rows += 1
+        self.rows += 1
+
+
+class VideoWorkbook:
+    """
+    以只写模式生成一个视频的四表工作簿（评论、弹幕、视频信息、统计数据），
+    工作表在创建时就按此顺序排列，各表可以按任意顺序写入
+    """
+
+    def __init__(self, path, max_rows=EXCEL_MAX_ROWS):
+        """
+        :param path: 保存路径
+        :param max_rows: 单个工作表的最大行数（含表头）
+        """
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+        self.comments = SplitSheet(self.workbook, '评论', COMMENT_COLUMNS, max_rows)
+        self.danmaku = SplitSheet(self.workbook, '弹幕', [title for _, title in DANMAKU_SHEET_COLUMNS], max_rows)
+        self.info = SplitSheet(self.workbook, '视频信息', ['标题', '描述'], max_rows)
+        # 统计数据的列取决于接口返回的字段，写入时再确定表头
+        self.stats = SplitSheet(self.workbook, '统计数据', None, max_rows)
+        self._saved = False
+        self._aborted = False
+
+    def write_page(self, page, comments):
+        """作为stream_video_comments的sink使用：写入一页评论"""
+        self.write_comments(comments)
+
+    def write_comments(self, comments):
+        for comm in comments:
+            self.comments.append([comm.get(key) for key in COMMENT_COLUMNS])
+
+    def write_danmaku(self, store):
+        """逐块写入DanmakuStore中的弹幕"""
+        arrays = {name: store.column(name) for name, _ in DANMAKU_SHEET_COLUMNS if name != 'text'}
+        for start in range(0, len(store), DANMAKU_CHUNK_ROWS):
+            end = min(start + DANMAKU_CHUNK_ROWS, len(store))
+            columns = {name: values[start:end].tolist() for name, values in arrays.items()}
+            columns['text'] = [store.text(i) for i in range(start, end)]
+            columns['ctime'] = [datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None)
+                                for ts in columns['ctime']]
+            columns['mid_hash'] = [f"{h:08x}" for h in columns['mid_hash']]
+            # dmid有19位，超过Excel的15位有效数字，与mid_hash一样按文本写入
+            columns['dmid'] = [str(d) for d in columns['dmid']]
+            for i in range(end - start):
+                self.danmaku.append([columns[name][i] for name, _ in DANMAKU_SHEET_COLUMNS])
+
+    def write_danmaku_part(self, part, title, store):
+        """作为stream_video_danmaku的sink使用：写入一个分P的弹幕"""
+        self.write_danmaku(store)
+
+    def write_info(self, title, description):
+        self.info.append([title, description])
+
+    def write_stats(self, stat):
+        if not stat:
+            return
+        self.stats.set_header(stat.keys())
+        self.stats.append(list(stat.values()))
+
+    def write_video(self, data):
+        """
+        写入crawl_video的结果
+        :param data: comments为None时（评论已通过write_page写入）不再写评论，
+                     danmaku为None时（弹幕已通过write_danmaku_part写入）不再写弹幕
+        """
+        if data['comments'] is not None:
+            self.write_comments(data['comments'])
+        if data['danmaku'] is not None:
+            self.write_danmaku(data['danmaku'])
+        self.write_info(data['title'], data['description'])
+        self.write_stats(data['stat'])
+
+    def save(self):
+        """保存工作簿（只写模式只能保存一次，重复调用无效）"""
+        if self._saved:
+            return
+        if self._aborted:
+            raise ValueError(f"工作簿 {self.path} 已放弃，不能保存")
+        self.workbook.save(self.path)
+        self._saved = True
+
+    def abort(self):
+        """
+        作为sink使用时抓取失败由调用方放弃：关闭各工作表并删除已写入的临时文件，不生成xlsx
+        save之后调用无效
+        """
+        if self._saved or self._aborted:
+            return
+        self._aborted = True
+        # 只写工作表的行先写入openpyxl的临时文件，保存时才打包进xlsx，不删除时要到进程退出才清理
+        for sheet in self.workbook.worksheets:
+            sheet.close()
+            sheet._writer.cleanup()
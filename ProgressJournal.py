@@ -0,0 +1,146 @@
+"""
+批量爬取进度日志
+
+只追加写入的JSONL文件，每行一条记录：
+    {"type": "page", "bvid": ..., "page": 页码, "comments": [该页解析出的评论]}
+    {"type": "comments_done", "bvid": ...}
+    {"type": "done", "bvid": ...}
+每条记录写入后立即落盘，进程被中断后重新运行时跳过已完成的视频，
+未完成视频的评论从最后记录的页码之后继续抓取，已记录的页面不再请求。
+内存中只保存页码，恢复时再从文件中逐页读出评论。
+视频完成后它的页面记录不再需要，这样的记录累积到COMPACT_STALE_PAGES条或关闭日志时，
+日志被压缩为只保留完成标记和未完成视频的记录，文件大小不随已爬取的评论数增长。
+"""
+import os
+import json
+
+# 已完成视频的页面记录累积到多少条时压缩日志（每次压缩都重写整个文件，不在每个视频完成后进行）
+COMPACT_STALE_PAGES = 1000
+
+
+class ProgressJournal:
+    """记录已完成的视频和每个视频的评论抓取进度"""
+
+    def __init__(self, path, compact_threshold=COMPACT_STALE_PAGES):
+        """
+        :param path: 日志文件路径，文件已存在时先读取其中的进度
+        :param compact_threshold: 已完成视频的页面记录累积到多少条时压缩日志
+        """
+        self.path = path
+        self.done = set()
+        self.comments_done = set()
+        # bvid -> 已记录的页码集合
+        self.pages = {}
+        self.compact_threshold = compact_threshold
+        # 文件中已完成视频的页面记录数
+        self._stale = 0
+        self._load()
+        if self._stale:
+            self._compact()
+        self._open()
+
+    def _open(self):
+        self._file = open(self.path, 'a', encoding='utf-8')
+        # 上次中断时最后一行可能没有写完，新记录另起一行
+        if self._file.tell() and not self._ends_with_newline():
+            self._file.write('\n')
+
+    def _iter_records(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # 中断时未写完的最后一行
+                    continue
+
+    def _load(self):
+        for record in self._iter_records():
+            bvid = record.get('bvid')
+            kind = record.get('type')
+            if kind == 'page':
+                self.pages.setdefault(bvid, set()).add(record['page'])
+            elif kind == 'comments_done':
+                self.comments_done.add(bvid)
+            elif kind == 'done':
+                self.done.add(bvid)
+        # 已完成视频的进度不再需要
+        for bvid in self.done:
+            self._stale += len(self.pages.pop(bvid, ()))
+
+    def _compact(self):
+        """
+        重写日志，只保留完成标记和未完成视频的记录
+        先写入临时文件并落盘再替换原文件，压缩过程中被中断时原日志不受影响
+        """
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for record in self._iter_records():
+                if record.get('type') == 'done' or record.get('bvid') not in self.done:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self._stale = 0
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def _append(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def is_done(self, bvid):
+        return bvid in self.done
+
+    def resume_state(self, bvid):
+        """
+        :return: (下一个要抓取的页码, 评论是否已全部抓取)
+        """
+        pages = self.pages.get(bvid)
+        next_page = max(pages) + 1 if pages else 1
+        return next_page, bvid in self.comments_done
+
+    def iter_pages(self, bvid):
+        """
+        从文件中按页码顺序逐页读出已记录的评论
+        :return: 生成器，产出 (页码, 评论列表)
+        """
+        if bvid not in self.pages:
+            return
+        self._file.flush()
+        last_page = 0
+        for record in self._iter_records():
+            if record.get('type') == 'page' and record.get('bvid') == bvid and record['page'] > last_page:
+                last_page = record['page']
+                yield last_page, record['comments']
+
+    def record_page(self, bvid, page, comments):
+        """记录一页评论的解析结果"""
+        self.pages.setdefault(bvid, set()).add(page)
+        self._append({'type': 'page', 'bvid': bvid, 'page': page, 'comments': comments})
+
+    def record_comments_done(self, bvid):
+        """记录一个视频的评论已全部抓取"""
+        self.comments_done.add(bvid)
+        self._append({'type': 'comments_done', 'bvid': bvid})
+
+    def record_done(self, bvid):
+        """记录一个视频已处理完成并保存，它的页面记录在下次压缩时删除"""
+        self.done.add(bvid)
+        self._append({'type': 'done', 'bvid': bvid})
+        self._stale += len(self.pages.pop(bvid, ()))
+        if self._stale >= self.compact_threshold:
+            self._file.close()
+            self._compact()
+            self._open()
+
+    def close(self):
+        self._file.close()
+        if self._stale:
+            self._compact()
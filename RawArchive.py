@@ -0,0 +1,297 @@
+"""
+接口原始响应归档
+
+抓取时把评论、楼中楼、view/pagelist、弹幕接口的原始返回内容（JSON、XML、protobuf）逐条压缩后追加写入归档，
+以后需要新的字段（用户等级、IP属地等）时修改解析函数后重新解析即可，不需要重新爬取。
+目录结构：
+    payloads.zst        只追加的数据文件，每条响应是一个独立的zstd帧
+    index.jsonl         只追加的索引，每行一条：{"bvid", "endpoint", "page", "offset", "length", "size", "dict", "fetched"}
+    dicts/<接口>-<字典ID>.zdict   按接口训练的zstd字典
+同一接口的单页JSON很小、结构高度重复，普通压缩效果有限；某个接口积累DICT_TRAIN_SAMPLES条响应后
+自动用这些响应训练字典，之后该接口的响应用字典压缩（旧字典保留，已写入的帧按索引中记录的字典ID解压），
+compact()可用最新的字典重写整个归档。
+"""
+import os
+import json
+import time
+
+import zstandard as zstd
+
+PAYLOAD_FILE = 'payloads.zst'
+INDEX_FILE = 'index.jsonl'
+DICT_DIR = 'dicts'
+
+# 压缩级别、训练字典所需的样本数、字典大小（字节）
+COMPRESSION_LEVEL = 9
+DICT_TRAIN_SAMPLES = 256
+DICT_SIZE = 112 * 1024
+
+
+def page_sort_key(page):
+    """页码排序：整数页码按数值排序，"根评论ID:页码"这样的组合页码按各段数值排序"""
+    try:
+        return tuple(int(part) for part in str(page).split(':'))
+    except ValueError:
+        return (float('inf'), str(page))
+
+
+def to_bytes(payload):
+    """接口返回的字典保存为紧凑的JSON，字符串按UTF-8编码，bytes原样保存"""
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        return bytes(payload)
+    if isinstance(payload, str):
+        return payload.encode('utf-8')
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class RawArchive:
+    """按 (BV号, 接口, 页码) 索引的原始响应归档，同一个键可以写入多次，默认读取最后一次"""
+
+    def __init__(self, root, level=COMPRESSION_LEVEL, train_samples=DICT_TRAIN_SAMPLES, dict_size=DICT_SIZE):
+        """
+        :param root: 归档目录，已存在时先读取其中的索引和字典
+        :param level: zstd压缩级别
+        :param train_samples: 某个接口积累多少条无字典的响应后自动训练字典，为0时不自动训练
+        :param dict_size: 训练的字典大小（字节）
+        """
+        self.root = root
+        self.level = level
+        self.train_samples = train_samples
+        self.dict_size = dict_size
+        os.makedirs(os.path.join(root, DICT_DIR), exist_ok=True)
+        self.payload_path = os.path.join(root, PAYLOAD_FILE)
+        self.index_path = os.path.join(root, INDEX_FILE)
+
+        # (bvid, endpoint, page) -> [索引记录, ...]，按写入顺序；(bvid, endpoint) -> 页码集合
+        self._entries = {}
+        self._pages = {}
+        # 字典ID -> ZstdCompressionDict；接口 -> 当前使用的字典ID
+        self._dicts = {}
+        self._current_dict = {}
+        # 接口 -> 尚未使用字典压缩的响应数
+        self._undictionaried = {}
+        self._compressors = {}
+        self._decompressors = {}
+
+        self._load_dicts()
+        self._load_index()
+        self._payload = open(self.payload_path, 'ab')
+        self._reader = None
+        self._index = open(self.index_path, 'a', encoding='utf-8')
+        # 上次中断时最后一行可能没有写完，新记录另起一行
+        if self._index.tell() and not self._ends_with_newline():
+            self._index.write('\n')
+
+    def _load_dicts(self):
+        folder = os.path.join(self.root, DICT_DIR)
+        for name in sorted(os.listdir(folder), key=lambda n: os.path.getmtime(os.path.join(folder, n))):
+            if not name.endswith('.zdict'):
+                continue
+            endpoint, dict_id = name[:-len('.zdict')].rsplit('-', 1)
+            with open(os.path.join(folder, name), 'rb') as f:
+                self._dicts[int(dict_id)] = zstd.ZstdCompressionDict(f.read())
+            # 按修改时间排序，同一接口最后训练的字典为当前字典
+            self._current_dict[endpoint] = int(dict_id)
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        payload_size = os.path.getsize(self.payload_path) if os.path.exists(self.payload_path) else 0
+        with open(self.index_path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 中断时未写完的最后一行
+                    continue
+                if record['offset'] + record['length'] > payload_size:
+                    continue
+                self._add_entry(record)
+
+    def _add_entry(self, record):
+        key = (record['bvid'], record['endpoint'], record['page'])
+        self._entries.setdefault(key, []).append(record)
+        self._pages.setdefault(key[:2], set()).add(key[2])
+        if not record['dict']:
+            endpoint = record['endpoint']
+            self._undictionaried[endpoint] = self._undictionaried.get(endpoint, 0) + 1
+
+    def _ends_with_newline(self):
+        with open(self.index_path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def _compressor(self, dict_id):
+        if dict_id not in self._compressors:
+            dict_data = self._dicts.get(dict_id) if dict_id else None
+            self._compressors[dict_id] = zstd.ZstdCompressor(level=self.level, dict_data=dict_data)
+        return self._compressors[dict_id]
+
+    def _decompressor(self, dict_id):
+        if dict_id not in self._decompressors:
+            dict_data = self._dicts.get(dict_id) if dict_id else None
+            self._decompressors[dict_id] = zstd.ZstdDecompressor(dict_data=dict_data)
+        return self._decompressors[dict_id]
+
+    def put(self, bvid, endpoint, page, payload):
+        """
+        追加一条原始响应
+        :param endpoint: 接口名（如 reply、sub_reply、view、pagelist、dm、dm_seg）
+        :param page: 页码，整数或"根评论ID:页码"这样的字符串
+        :param payload: 接口返回的字典、文本或bytes
+        """
+        data = to_bytes(payload)
+        dict_id = self._current_dict.get(endpoint, 0)
+        frame = self._compressor(dict_id).compress(data)
+
+        offset = self._payload.tell()
+        self._payload.write(frame)
+        self._payload.flush()
+        record = {'bvid': bvid, 'endpoint': endpoint, 'page': page, 'offset': offset, 'length': len(frame),
+                  'size': len(data), 'dict': dict_id, 'fetched': int(time.time())}
+        # 先写数据再写索引，中断时最多留下没有索引的数据
+        self._index.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._index.flush()
+        self._add_entry(record)
+
+        if (self.train_samples and not dict_id
+                and self._undictionaried.get(endpoint, 0) >= self.train_samples):
+            self.train_dictionary(endpoint)
+
+    def _read(self, record):
+        if self._reader is None:
+            self._reader = open(self.payload_path, 'rb')
+        self._payload.flush()
+        self._reader.seek(record['offset'])
+        frame = self._reader.read(record['length'])
+        return self._decompressor(record['dict']).decompress(frame, max_output_size=record['size'])
+
+    def get(self, bvid, endpoint, page=0):
+        """
+        :return: 最后一次写入的原始响应（bytes），不存在时返回None
+        """
+        records = self._entries.get((bvid, endpoint, page))
+        return self._read(records[-1]) if records else None
+
+    def get_json(self, bvid, endpoint, page=0):
+        """
+        :return: 最后一次写入的响应解析后的JSON，不存在时返回None
+        """
+        data = self.get(bvid, endpoint, page)
+        return json.loads(data) if data is not None else None
+
+    def record(self, bvid, endpoint, page=0):
+        """
+        :return: 最后一次写入的索引记录（含抓取时间fetched），不存在时返回None
+        """
+        records = self._entries.get((bvid, endpoint, page))
+        return dict(records[-1]) if records else None
+
+    def versions(self, bvid, endpoint, page=0):
+        """
+        同一个键的全部写入（如不同日期增量更新时抓取的同一页）
+        :return: 按写入顺序的原始响应列表
+        """
+        return [self._read(record) for record in self._entries.get((bvid, endpoint, page), [])]
+
+    def pages(self, bvid, endpoint):
+        """
+        :return: 一个视频在某个接口下已归档的页码，按页码顺序
+        """
+        return sorted(self._pages.get((bvid, endpoint), ()), key=page_sort_key)
+
+    def bvids(self):
+        """
+        :return: 归档中的全部BV号，按首次写入顺序
+        """
+        return list(dict.fromkeys(bvid for bvid, _ in self._pages))
+
+    def __contains__(self, key):
+        """key为 (BV号, 接口, 页码)"""
+        return key in self._entries
+
+    def samples(self, endpoint, limit=None):
+        """
+        读取某个接口最近归档的原始响应，用作训练字典的样本
+        :param limit: 最多读取的条数
+        """
+        records = sorted((r for (_, e, _), rs in self._entries.items() if e == endpoint for r in rs),
+                         key=lambda r: r['offset'])
+        if limit is not None:
+            records = records[-limit:]
+        return [self._read(record) for record in records]
+
+    def train_dictionary(self, endpoint, samples=None):
+        """
+        用某个接口的响应训练字典，之后写入该接口的响应使用此字典压缩
+        :param samples: 训练样本（bytes列表），默认使用归档中该接口最近的响应
+        :return: 字典ID，样本不足或训练失败时返回None
+        """
+        if samples is None:
+            samples = self.samples(endpoint, limit=max(self.train_samples, DICT_TRAIN_SAMPLES) * 4)
+        try:
+            dict_data = zstd.train_dictionary(self.dict_size, samples, level=self.level)
+        except zstd.ZstdError as e:
+            print(f"训练{endpoint}接口的压缩字典失败: {str(e)}")
+            # 不再为这一批样本重复尝试
+            self._undictionaried[endpoint] = 0
+            return None
+
+        dict_id = dict_data.dict_id()
+        with open(os.path.join(self.root, DICT_DIR, f"{endpoint}-{dict_id}.zdict"), 'wb') as f:
+            f.write(dict_data.as_bytes())
+        self._dicts[dict_id] = dict_data
+        self._current_dict[endpoint] = dict_id
+        self._undictionaried[endpoint] = 0
+        print(f"已用{len(samples)}条{endpoint}接口响应训练压缩字典（ID {dict_id}）")
+        return dict_id
+
+    def stats(self):
+        """
+        :return: 接口 -> {'count': 响应数, 'size': 原始字节数, 'stored': 压缩后字节数, 'ratio': 压缩比}
+        """
+        result = {}
+        for (_, endpoint, _), records in self._entries.items():
+            item = result.setdefault(endpoint, {'count': 0, 'size': 0, 'stored': 0})
+            for record in records:
+                item['count'] += 1
+                item['size'] += record['size']
+                item['stored'] += record['length']
+        for item in result.values():
+            item['ratio'] = item['size'] / item['stored'] if item['stored'] else 0
+        return result
+
+    def compact(self):
+        """
+        用各接口当前的字典重新压缩全部响应，写入新文件后替换原归档（每个键的各次写入都保留）
+        """
+        temp_payload = self.payload_path + '.tmp'
+        temp_index = self.index_path + '.tmp'
+        records = sorted((r for rs in self._entries.values() for r in rs), key=lambda r: r['offset'])
+        new_records = []
+        with open(temp_payload, 'wb') as payload, open(temp_index, 'w', encoding='utf-8') as index:
+            for record in records:
+                dict_id = self._current_dict.get(record['endpoint'], 0)
+                frame = self._compressor(dict_id).compress(self._read(record))
+                new_record = dict(record, offset=payload.tell(), length=len(frame), dict=dict_id)
+                payload.write(frame)
+                index.write(json.dumps(new_record, ensure_ascii=False) + '\n')
+                new_records.append(new_record)
+
+        self.close()
+        os.replace(temp_payload, self.payload_path)
+        os.replace(temp_index, self.index_path)
+        self._entries = {}
+        self._pages = {}
+        self._undictionaried = {}
+        for record in new_records:
+            self._add_entry(record)
+        self._payload = open(self.payload_path, 'ab')
+        self._index = open(self.index_path, 'a', encoding='utf-8')
+
+    def close(self):
+        self._payload.close()
+        self._index.close()
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
@@ -0,0 +1,210 @@
+import os
+import json
+from collections import Counter
+from fnmatch import fnmatchcase
+
+# 资源拦截策略：按类别列出CDP Network.setBlockedURLs使用的URL通配模式
+# 只读取元数据时，视频流、图片、字体和统计上报脚本都是无用流量
+RESOURCE_BLOCK_PATTERNS = {
+    'media': [
+        '*.m4s*',
+        '*.flv*',
+        '*.mp4*',
+        '*.bilivideo.com/*',
+        '*.bilivideo.cn/*',
+    ],
+    'images': [
+        '*.jpg*',
+        '*.jpeg*',
+        '*.png*',
+        '*.gif*',
+        '*.webp*',
+        '*.avif*',
+        '*.ico*',
+    ],
+    'fonts': [
+        '*.woff*',
+        '*.ttf*',
+        '*.otf*',
+    ],
+    'analytics': [
+        '*data.bilibili.com/*',
+        '*cm.bilibili.com/*',
+        '*api.bilibili.com/x/click-interface/*',
+        '*log-reporter*',
+        '*hm.baidu.com/*',
+    ],
+}
+
+DEFAULT_BLOCKED_RESOURCES = ('media', 'images', 'fonts', 'analytics')
+
+# 各类资源单个请求平均传输字节数的持久化基准：每次运行把实际加载（未被拦截）的请求累加进去，
+# 不拦截资源（block_resources=()）运行一次即可得到所有类别的实测平均值
+BASELINE_FILE = 'resource_baseline.json'
+# 基准中还没有某类资源的数据时使用的单个请求平均大小（B站视频页的典型值）
+DEFAULT_AVERAGE_BYTES = {
+    'media': 1024 * 1024,
+    'images': 40 * 1024,
+    'fonts': 50 * 1024,
+    'analytics': 1024,
+}
+
+
+def configure_options(chrome_options, page_load_strategy='eager'):
+    """
+    设置页面加载策略，并开启performance日志用于统计网络请求
+    :param chrome_options: selenium的Chrome Options
+    :param page_load_strategy: normal/eager/none，eager在DOMContentLoaded后即返回，不等图片等子资源
+    """
+    if page_load_strategy:
+        chrome_options.page_load_strategy = page_load_strategy
+    chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+
+def blocked_url_patterns(categories):
+    """返回指定类别的全部URL通配模式"""
+    patterns = []
+    for category in categories:
+        patterns.extend(RESOURCE_BLOCK_PATTERNS[category])
+    return patterns
+
+
+def apply_blocked_resources(driver, categories):
+    """
+    通过CDP拦截指定类别的资源（只作用于当前标签页）
+    :param driver: WebDriver
+    :param categories: 类别列表，见RESOURCE_BLOCK_PATTERNS
+    """
+    patterns = blocked_url_patterns(categories)
+    if not patterns:
+        return
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+
+
+def classify_url(url):
+    """按RESOURCE_BLOCK_PATTERNS判断URL属于哪个资源类别，都不匹配时返回'other'"""
+    for category, patterns in RESOURCE_BLOCK_PATTERNS.items():
+        for pattern in patterns:
+            if fnmatchcase(url, pattern):
+                return category
+    return 'other'
+
+
+class ResourceReport:
+    """
+    根据Chrome performance日志统计每类资源的请求数和传输字节数，以及被拦截的请求数
+    被拦截的请求不会产生流量，节省的字节数按基准中该类请求的平均大小估算（estimate_avoided_bytes）
+    """
+
+    def __init__(self):
+        self.blocked = Counter()
+        self.loaded = Counter()
+        self.loaded_bytes = Counter()
+        self._urls = {}
+
+    def consume(self, log_entries):
+        """
+        处理driver.get_log('performance')返回的日志
+        :param log_entries: 日志条目列表
+        """
+        for entry in log_entries:
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, TypeError, ValueError):
+                continue
+
+            method = message.get('method')
+            params = message.get('params', {})
+
+            if method == 'Network.requestWillBeSent':
+                self._urls[params.get('requestId')] = params.get('request', {}).get('url', '')
+            elif method == 'Network.loadingFinished':
+                category = classify_url(self._urls.pop(params.get('requestId'), ''))
+                self.loaded[category] += 1
+                self.loaded_bytes[category] += int(params.get('encodedDataLength', 0))
+            elif method == 'Network.loadingFailed':
+                url = self._urls.pop(params.get('requestId'), '')
+                if params.get('blockedReason') == 'inspector':
+                    self.blocked[classify_url(url)] += 1
+
+    def merge(self, other):
+        """合并另一份统计（多个工作进程汇总时使用）"""
+        self.blocked.update(other.blocked)
+        self.loaded.update(other.loaded)
+        self.loaded_bytes.update(other.loaded_bytes)
+
+    def estimate_avoided_bytes(self, baseline=None):
+        """
+        估算节省的字节数：每类被拦截请求数 × 基准中该类请求的平均大小，基准中没有的类别使用DEFAULT_AVERAGE_BYTES
+        :param baseline: 作为基准的ResourceReport（如load_baseline的结果），为None时只使用默认平均大小
+        :return: {类别: (估算字节数, 是否来自实测基准)}
+        """
+        avoided = {}
+        for category, count in self.blocked.items():
+            if baseline is not None and baseline.loaded[category]:
+                average = baseline.loaded_bytes[category] / baseline.loaded[category]
+                avoided[category] = (int(count * average), True)
+            else:
+                avoided[category] = (count * DEFAULT_AVERAGE_BYTES.get(category, 0), False)
+        return avoided
+
+    def save_baseline(self, path=BASELINE_FILE):
+        """把本次实际加载的请求数和字节数累加到基准文件"""
+        data = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+        for category, count in self.loaded.items():
+            item = data.setdefault(category, {'requests': 0, 'bytes': 0})
+            item['requests'] += count
+            item['bytes'] += self.loaded_bytes[category]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load_baseline(cls, path=BASELINE_FILE):
+        """
+        读取基准文件
+        :return: ResourceReport（只有loaded和loaded_bytes），文件不存在或无法解析时返回None
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        baseline = cls()
+        for category, item in data.items():
+            baseline.loaded[category] = item.get('requests', 0)
+            baseline.loaded_bytes[category] = item.get('bytes', 0)
+        return baseline
+
+    def finish_run(self, baseline_path=BASELINE_FILE):
+        """运行结束时调用：先把本次加载的请求记入基准，再按基准打印统计（含估算节省的流量）"""
+        try:
+            self.save_baseline(baseline_path)
+        except OSError as e:
+            print(f"保存资源基准失败: {str(e)}")
+        self.print_summary(self.load_baseline(baseline_path))
+
+    def print_summary(self, baseline=None):
+        """
+        打印本次运行的资源统计
+        :param baseline: 估算节省流量使用的基准，为None时使用默认平均大小
+        """
+        print("\n资源统计:")
+        print(f"  已加载请求: {sum(self.loaded.values())} 个，传输 {sum(self.loaded_bytes.values()) / 1024 / 1024:.2f} MB")
+        for category in sorted(self.loaded):
+            print(f"    {category}: {self.loaded[category]} 个，{self.loaded_bytes[category] / 1024:.0f} KB")
+        avoided = self.estimate_avoided_bytes(baseline)
+        print(f"  已拦截请求: {sum(self.blocked.values())} 个，"
+              f"估算节省流量 {sum(size for size, _ in avoided.values()) / 1024 / 1024:.2f} MB")
+        for category in sorted(self.blocked):
+            size, measured = avoided[category]
+            source = '实测平均值' if measured else '默认平均值'
+            print(f"    {category}: {self.blocked[category]} 个，约 {size / 1024:.0f} KB（按{source}）")
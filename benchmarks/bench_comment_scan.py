@@ -0,0 +1,85 @@
+"""
+评论数兜底搜索基准：旧的 querySelectorAll('*') + textContent 与有界TreeWalker搜索对比
+用法: python benchmarks/bench_comment_scan.py [保存的页面1.html 页面2.html ...]
+不传页面时生成一个评论很多的合成页面；需要本地Chrome和ChromeDriver
+"""
+import os
+import sys
+import tempfile
+import pathlib
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from BilibiliVideoInfoCrawler import COMMENT_SCAN_JS
+
+# 旧实现（原"方法4"），在页面内计时
+LEGACY_JS = """
+const start = performance.now();
+let count = 0;
+const allElements = document.querySelectorAll('*');
+for (let elem of allElements) {
+    const text = elem.textContent.trim();
+    if (text.includes('评论') && /\\d+/.test(text)) {
+        count = parseInt(text.match(/\\d+/)[0]);
+        break;
+    }
+}
+return {count: count, ms: performance.now() - start};
+"""
+
+BOUNDED_JS = COMMENT_SCAN_JS + """
+const start = performance.now();
+const scanned = scanCommentCount(200);
+return {count: scanned.count, ms: performance.now() - start, timedOut: scanned.timedOut};
+"""
+
+
+def build_synthetic_fixture(directory, comments=3000, depth=6):
+    """生成评论区很深很长的页面：页面顶部有无关数字，评论数在评论容器头部"""
+    nested = ''.join('<div class="reply-item">' for _ in range(depth))
+    closing = '</div>' * depth
+    items = ''.join(
+        f'{nested}<span class="user">用户{i}</span><p>第{i}楼 评论内容 {i} 赞</p>{closing}\n'
+        for i in range(comments)
+    )
+    html = (
+        '<html><head><meta charset="utf-8"></head><body>'
+        '<div class="nav">热门 2024 排行榜 100</div>'
+        '<div id="commentapp"><div class="reply-header"><span>评论</span><span>12345</span></div>'
+        f'<div class="reply-list">{items}</div></div></body></html>'
+    )
+    path = os.path.join(directory, 'synthetic_comments.html')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(html)
+    return path
+
+
+def main():
+    fixtures = sys.argv[1:]
+    tmp_dir = tempfile.mkdtemp()
+    if not fixtures:
+        fixtures = [build_synthetic_fixture(tmp_dir)]
+
+    options = Options()
+    options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    driver = webdriver.Chrome(options=options)
+
+    try:
+        for path in fixtures:
+            driver.get(pathlib.Path(path).resolve().as_uri())
+            legacy = driver.execute_script(LEGACY_JS)
+            bounded = driver.execute_script(BOUNDED_JS)
+            print(f"\n{os.path.basename(path)}")
+            print(f"  querySelectorAll('*'): {legacy['ms']:9.2f} ms, 评论数: {legacy['count']}")
+            print(f"  有界TreeWalker搜索:    {bounded['ms']:9.2f} ms, 评论数: {bounded['count']}"
+                  f"{' (超时)' if bounded['timedOut'] else ''}")
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
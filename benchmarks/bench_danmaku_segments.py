@@ -0,0 +1,126 @@
+"""
+分段弹幕下载基准：在本地启动一个模拟 x/v2/dm/web/seg.so 的测试服务器，
+对比逐段下载(并发1) 与 并发下载各分段的耗时，并检查解码出的弹幕条数
+用法: python benchmarks/bench_danmaku_segments.py [分段数] [每段弹幕数] [每次响应延迟毫秒] [录制分段目录]
+录制分段目录中的文件按 <分段序号>.bin 命名（接口原始响应），给定时忽略分段数和每段弹幕数
+基准中关闭了共享速率上限，实际运行时并发下载同样受 HTTP_MAX_RATE 限制
+"""
+import os
+import sys
+import io
+import time
+import asyncio
+import contextlib
+
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import Bli_CDScraper
+from Bli_CDScraper import AsyncRateLimiter, fetch_part_danmaku_segmented, close_http_session
+from DanmakuStore import parse_danmaku_segment
+
+SEGMENT_PATH = "/x/v2/dm/web/seg.so"
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _varint_field(field, value):
+    return _varint(field << 3) + _varint(value)
+
+
+def _bytes_field(field, data):
+    return _varint(field << 3 | 2) + _varint(len(data)) + data
+
+
+def make_segment(index, count):
+    """生成一段包含count条弹幕的DmSegMobileReply"""
+    body = bytearray()
+    for i in range(count):
+        progress_ms = (index - 1) * 360000 + i * 360000 // count
+        elem = (_varint_field(1, index * 1000000 + i)
+                + _varint_field(2, progress_ms)
+                + _varint_field(3, 1)
+                + _varint_field(4, 25)
+                + _varint_field(5, 16777215)
+                + _bytes_field(6, f"{i:08x}".encode())
+                + _bytes_field(7, f"第{index}段弹幕{i}".encode('utf-8'))
+                + _varint_field(8, 1700000000 + i)
+                + _varint_field(9, 10))
+        body += _bytes_field(1, elem)
+    return bytes(body)
+
+
+def load_segments(args):
+    if len(args) > 3:
+        folder = args[3]
+        names = sorted((f for f in os.listdir(folder) if f.endswith('.bin')), key=lambda f: int(f[:-4]))
+        segments = {}
+        for name in names:
+            with open(os.path.join(folder, name), 'rb') as f:
+                segments[int(name[:-4])] = f.read()
+        return segments
+
+    count = int(args[0]) if args else 20
+    per_segment = int(args[1]) if len(args) > 1 else 3000
+    return {index: make_segment(index, per_segment) for index in range(1, count + 1)}
+
+
+async def start_server(segments, latency):
+    async def handle(request):
+        await asyncio.sleep(latency)
+        data = segments.get(int(request.query.get('segment_index', 0)), b'')
+        return web.Response(body=data, content_type='application/octet-stream')
+
+    app = web.Application()
+    app.router.add_get(SEGMENT_PATH, handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}{SEGMENT_PATH}"
+
+
+async def bench(name, base_url, segments, concurrency):
+    duration = max(segments) * Bli_CDScraper.DANMAKU_SEGMENT_SECONDS
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        store = await fetch_part_danmaku_segmented(
+            'BENCH', 1, 0, duration, asyncio.Semaphore(concurrency), base_url)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<16} {elapsed:7.2f} 秒  弹幕 {len(store)} 条")
+    return store
+
+
+async def main():
+    args = sys.argv[1:]
+    latency = int(args[2]) / 1000 if len(args) > 2 else 0.2
+    segments = load_segments(args)
+    expected = sum(len(parse_danmaku_segment(data)) for data in segments.values())
+    print(f"分段数 {len(segments)}  弹幕总数 {expected}  每次响应延迟 {latency * 1000:.0f} ms")
+
+    Bli_CDScraper.http_limiter = AsyncRateLimiter(None)
+    runner, base_url = await start_server(segments, latency)
+    try:
+        serial = await bench("逐段下载", base_url, segments, 1)
+        parallel = await bench(f"并发{len(segments)}段", base_url, segments, len(segments))
+        same = list(serial.dmid) == list(parallel.dmid) and len(parallel) == expected
+        print("结果一致" if same else "结果不一致！")
+    finally:
+        await close_http_session()
+        await runner.cleanup()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,153 @@
+"""
+Excel导出基准：原来的 DataFrame + pd.ExcelWriter 与 只写模式流式导出(VideoWorkbook) 对比
+用合成的评论和弹幕数据生成 BVID_<id>.xlsx，统计耗时和进程内存峰值(RSS)
+每种方式在单独的子进程中运行，互不影响内存统计
+用法: python benchmarks/bench_excel_export.py [评论数] [弹幕数] [输出目录]
+默认评论100万条、弹幕100万条（超过Excel行数上限时流式导出自动分表，旧实现会直接报错）；需要psutil
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+import subprocess
+
+import psutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = ('pandas', 'stream')
+
+
+def make_comments(count):
+    """生成count条parse_comment格式的评论，每条带两条楼中楼回复"""
+    for i in range(count):
+        rpid = 100000000 + i * 3
+        sub_replies = [{
+            'rpid': rpid + j, 'root': rpid, 'parent': rpid, 'mid': 2000 + j, 'uname': f"用户{j}",
+            'message': f"回复{j}：同意楼主的看法", 'ctime': 1700000000 + i, 'like': j,
+        } for j in (1, 2)]
+        yield {
+            'comment': f"第{i}条评论，视频讲得很清楚，收藏了",
+            'reply': [f"{item['uname']}: {item['message']}" for item in sub_replies],
+            'rpid': rpid,
+            'ctime': 1700000000 + i,
+            'mid': 1000 + i % 5000,
+            'uname': f"用户{i % 5000}",
+            'like': i % 300,
+            'sub_replies': sub_replies,
+        }
+
+
+def make_danmaku(count):
+    from DanmakuStore import DanmakuStore
+    store = DanmakuStore()
+    for i in range(count):
+        store.append(i % 3600 + 0.5, 1, 25, 16777215, 1700000000 + i, 0, i * 2654435761 % 2 ** 32, i, 0,
+                     f"第{i}条弹幕")
+    return store
+
+
+def make_data(comment_count, danmaku_count):
+    return {
+        'comments': list(make_comments(comment_count)),
+        'danmaku': make_danmaku(danmaku_count),
+        'title': '基准测试视频',
+        'description': '合成数据',
+        'stat': {'view': 1000000, 'danmaku': danmaku_count, 'reply': comment_count, 'like': 50000},
+    }
+
+
+def export_pandas(path, comment_count, danmaku_count):
+    """原来save_to_csv的做法：先构建四个完整的DataFrame，再用默认模式的pd.ExcelWriter写入"""
+    import pandas as pd
+    from ExcelExport import DANMAKU_SHEET_COLUMNS
+
+    data = make_data(comment_count, danmaku_count)
+    columns = data['danmaku'].to_dict()
+    columns['ctime'] = pd.to_datetime(columns['ctime'], unit='s')
+    columns['mid_hash'] = [f"{h:08x}" for h in columns['mid_hash']]
+    df2 = pd.DataFrame({title: columns[name] for name, title in DANMAKU_SHEET_COLUMNS})
+    df3 = pd.DataFrame([{'标题': data['title'], '描述': data['description']}])
+    df4 = pd.DataFrame([data['stat']])
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame(data['comments']).to_excel(writer, sheet_name='评论', index=False)
+        df2.to_excel(writer, sheet_name='弹幕', index=False)
+        df3.to_excel(writer, sheet_name='视频信息', index=False)
+        df4.to_excel(writer, sheet_name='统计数据', index=False)
+
+
+def export_stream(path, comment_count, danmaku_count):
+    """评论按每页20条边生成边写入（相当于抓取时作为sink），弹幕从DanmakuStore逐块写入"""
+    from ExcelExport import VideoWorkbook
+
+    workbook = VideoWorkbook(path)
+    page = []
+    for comm in make_comments(comment_count):
+        page.append(comm)
+        if len(page) == 20:
+            workbook.write_page(None, page)
+            page = []
+    workbook.write_page(None, page)
+    workbook.write_video({
+        'comments': None,
+        'danmaku': make_danmaku(danmaku_count),
+        'title': '基准测试视频',
+        'description': '合成数据',
+        'stat': {'view': 1000000, 'danmaku': danmaku_count, 'reply': comment_count, 'like': 50000},
+    })
+    workbook.save()
+
+
+def run_child(mode, path, comment_count, danmaku_count):
+    """在子进程中运行一种导出方式
+    :return: (耗时秒数, 内存峰值MB, 是否成功)
+    """
+    command = [sys.executable, os.path.abspath(__file__), '--child', mode, path,
+               str(comment_count), str(danmaku_count)]
+    start = time.perf_counter()
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    peak = [0]
+
+    def sample():
+        try:
+            child = psutil.Process(proc.pid)
+            while proc.poll() is None:
+                peak[0] = max(peak[0], child.memory_info().rss)
+                time.sleep(0.05)
+        except psutil.Error:
+            pass
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    output, _ = proc.communicate()
+    sampler.join()
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        print(f"{mode} 导出失败:\n{output.strip().splitlines()[-1] if output.strip() else ''}")
+    return elapsed, peak[0] / 1024 / 1024, proc.returncode == 0
+
+
+def main():
+    args = sys.argv[1:]
+    comment_count = int(args[0]) if args else 1000000
+    danmaku_count = int(args[1]) if len(args) > 1 else 1000000
+    folder = args[2] if len(args) > 2 else tempfile.mkdtemp(prefix='bench_excel_')
+    os.makedirs(folder, exist_ok=True)
+    print(f"评论 {comment_count} 条  弹幕 {danmaku_count} 条  输出目录 {folder}")
+
+    for mode in MODES:
+        path = os.path.join(folder, f"BVID_BENCH_{mode}.xlsx")
+        elapsed, peak_mb, ok = run_child(mode, path, comment_count, danmaku_count)
+        size = os.path.getsize(path) / 1024 / 1024 if ok and os.path.exists(path) else 0
+        print(f"{mode:<8} {elapsed:8.1f} 秒  内存峰值 {peak_mb:8.0f} MB  文件 {size:6.1f} MB"
+              + ("" if ok else "  （失败）"))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        mode, path, comments, danmaku = sys.argv[2:6]
+        {'pandas': export_pandas, 'stream': export_stream}[mode](path, int(comments), int(danmaku))
+    else:
+        main()
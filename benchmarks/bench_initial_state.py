@@ -0,0 +1,82 @@
+"""
+__INITIAL_STATE__提取微基准：BeautifulSoup全量DOM + split(';') 与单次扫描 + raw_decode 对比
+用法: python benchmarks/bench_initial_state.py [保存的视频页面.html] [重复次数]
+不传HTML文件时使用合成的数百KB页面
+"""
+import os
+import sys
+import json
+import time
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from BilibiliVideoInfoCrawler import extract_initial_state
+
+
+def legacy_extract(html):
+    """旧实现：构建完整DOM，遍历<script>，用split(';')截取JSON"""
+    soup = BeautifulSoup(html, 'html.parser')
+    for script in soup.find_all('script'):
+        if script.string and 'window.__INITIAL_STATE__' in script.string:
+            json_str = script.string.split('window.__INITIAL_STATE__=')[1]
+            json_str = json_str.split(';')[0] if ';' in json_str else json_str
+            json_str = json_str.split('(function')[0] if '(function' in json_str else json_str
+            try:
+                return json.loads(json_str)
+            except ValueError:
+                return None
+    return None
+
+
+def build_synthetic_page(kb=400):
+    """生成接近真实视频页大小的合成页面（描述中带分号，旧实现会解析失败）"""
+    state = {
+        'videoData': {
+            'bvid': 'BV1GJ411x7h7',
+            'title': '测试视频；第一集; part 1',
+            'desc': '简介里有分号; 也有(function字样',
+            'pubdate': 1700000000,
+            'owner': {'mid': 123, 'name': 'UP主'},
+            'stat': {'view': 123456, 'danmaku': 789, 'reply': 1011, 'favorite': 1213,
+                     'coin': 1415, 'share': 1617, 'like': 1819},
+        },
+        'related': [{'bvid': f'BV{i:010d}', 'title': f'相关视频{i}'} for i in range(200)],
+    }
+    filler = '<div class="item"><span>占位内容</span><a href="#">链接</a></div>\n'
+    body = filler * (kb * 1024 // len(filler.encode('utf-8')))
+    return (
+        '<html><head><script>var a = 1;</script></head><body>' + body +
+        '<script>window.__INITIAL_STATE__=' + json.dumps(state, ensure_ascii=False) +
+        ';(function(){var s;}());</script></body></html>'
+    )
+
+
+def bench(func, html, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(html)
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'r', encoding='utf-8') as f:
+            html = f.read()
+    else:
+        html = build_synthetic_page()
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    print(f"页面大小: {len(html.encode('utf-8')) / 1024:.0f} KB, 重复 {repeat} 次")
+
+    legacy_time, legacy_data = bench(legacy_extract, html, repeat)
+    fast_time, (_, fast_data) = bench(extract_initial_state, html, repeat)
+
+    print(f"BeautifulSoup + split: {legacy_time * 1000:8.2f} ms/页, 解析成功: {legacy_data is not None}")
+    print(f"单次扫描 + raw_decode: {fast_time * 1000:8.2f} ms/页, 解析成功: {fast_data is not None}")
+    if fast_time > 0:
+        print(f"加速比: {legacy_time / fast_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+冷启动与热启动页面加载耗时对比：空配置目录 vs 复用持久化配置目录（磁盘缓存、Cookie）
+用法: python benchmarks/bench_profile_cache.py [视频数]
+默认从all_bvids.json读取BVID；需要本地Chrome和ChromeDriver
+"""
+import os
+import sys
+import io
+import json
+import time
+import shutil
+import tempfile
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from BilibiliVideoInfoCrawler import BilibiliVideoCrawler
+
+
+def time_pages(bvid_list, **crawler_kwargs):
+    """新建一个Chrome进程依次加载bvid_list，返回每个页面的耗时（秒）"""
+    crawler = BilibiliVideoCrawler(headless=True, **crawler_kwargs)
+    timings = []
+    try:
+        for bvid in bvid_list:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                crawler.get_video_info_by_bvid(bvid)
+            timings.append(time.perf_counter() - start)
+    finally:
+        crawler.close()
+    return timings
+
+
+def print_timings(name, timings):
+    rest = timings[1:] or timings
+    print(f"{name:<10} 首页 {timings[0]:6.2f}s  其余平均 {sum(rest) / len(rest):6.2f}s  "
+          f"合计 {sum(timings):7.2f}s")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    with open(os.path.join(ROOT, 'all_bvids.json'), 'r', encoding='utf-8') as f:
+        bvids = json.load(f)
+    warmup_list, bvid_list = bvids[count:count * 2], bvids[:count]
+
+    profile_dir = tempfile.mkdtemp(prefix='bili_profile_')
+    try:
+        # 冷启动：每次都是空配置目录
+        cold = time_pages(bvid_list)
+
+        # 热启动：先用其他视频预热配置目录，再重启Chrome测量同样的视频
+        time_pages(warmup_list, profile_dir=profile_dir)
+        warm = time_pages(bvid_list, profile_dir=profile_dir)
+    finally:
+        shutil.rmtree(profile_dir, ignore_errors=True)
+
+    print(f"视频数 {len(bvid_list)}")
+    print_timings("冷启动", cold)
+    print_timings("热启动", warm)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+原始响应压缩基准：逐条zstd压缩 与 使用训练字典逐条压缩 的压缩比和吞吐量对比
+前一半响应用于训练字典，在后一半上测量（与RawArchive自动训练字典后的情形一致）
+用法: python benchmarks/bench_raw_archive.py [响应条数] [归档目录] [接口名]
+给定归档目录时使用其中该接口（默认reply）的真实响应，否则生成模拟的评论页JSON
+"""
+import os
+import sys
+import json
+import time
+import random
+
+import zstandard as zstd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from RawArchive import RawArchive, COMPRESSION_LEVEL, DICT_SIZE
+
+WORDS = ['视频', '讲得', '很清楚', '收藏了', '三连', '支持', 'up主', '学到了', '哈哈哈', '第一', '弹幕', '前排']
+
+
+def make_reply_page(page, rng):
+    """生成一页与评论接口结构相同的响应（20条评论，各带2条预览回复）"""
+    def reply(root):
+        rpid = rng.randint(10 ** 11, 10 ** 12)
+        return {
+            'rpid': rpid, 'oid': 1234567, 'type': 1, 'mid': rng.randint(1, 10 ** 9), 'root': root, 'parent': root,
+            'count': 0, 'rcount': rng.randint(0, 50), 'state': 0, 'ctime': 1700000000 + rng.randint(0, 10 ** 7),
+            'like': rng.randint(0, 5000), 'action': 0,
+            'member': {
+                'mid': str(rng.randint(1, 10 ** 9)), 'uname': f"用户{rng.randint(1, 99999)}", 'sex': '保密',
+                'sign': '', 'avatar': f"https://i0.hdslb.com/bfs/face/{rng.getrandbits(160):040x}.jpg",
+                'level_info': {'current_level': rng.randint(0, 6), 'current_min': 0, 'current_exp': 0},
+                'vip': {'vipType': rng.randint(0, 2), 'vipStatus': rng.randint(0, 1), 'vipDueDate': 0},
+            },
+            'content': {'message': ''.join(rng.choice(WORDS) for _ in range(rng.randint(3, 20))),
+                        'members': [], 'jump_url': {}, 'max_line': 6},
+            'reply_control': {'location': f"IP属地：{rng.choice(['广东', '北京', '上海', '浙江', '四川'])}",
+                              'time_desc': f"{rng.randint(1, 30)}天前发布"},
+        }
+
+    replies = []
+    for _ in range(20):
+        r = reply(0)
+        r['replies'] = [reply(r['rpid']) for _ in range(2)]
+        replies.append(r)
+    return {'page': {'num': page, 'size': 20, 'count': 20000, 'acount': 25000}, 'replies': replies}
+
+
+def load_payloads(args):
+    count = int(args[0]) if args else 2000
+    if len(args) > 1:
+        endpoint = args[2] if len(args) > 2 else 'reply'
+        archive = RawArchive(args[1], train_samples=0)
+        try:
+            return archive.samples(endpoint, limit=count)
+        finally:
+            archive.close()
+    rng = random.Random(0)
+    return [json.dumps(make_reply_page(i, rng), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            for i in range(1, count + 1)]
+
+
+def bench(name, compressor, decompressor, payloads):
+    start = time.perf_counter()
+    frames = [compressor.compress(data) for data in payloads]
+    compress_time = time.perf_counter() - start
+    start = time.perf_counter()
+    restored = [decompressor.decompress(frame) for frame in frames]
+    decompress_time = time.perf_counter() - start
+    size = sum(map(len, payloads))
+    stored = sum(map(len, frames))
+    mb = size / 1024 / 1024
+    print(f"{name:<12} 压缩后 {stored / 1024:9.0f} KB  压缩比 {size / stored:5.1f}  "
+          f"压缩 {mb / compress_time:7.1f} MB/s  解压 {mb / decompress_time:7.1f} MB/s")
+    return restored == payloads
+
+
+def main():
+    payloads = load_payloads(sys.argv[1:])
+    if len(payloads) < 20:
+        print("响应条数太少，无法训练字典")
+        return
+    half = len(payloads) // 2
+    train, test = payloads[:half], payloads[half:]
+    size = sum(map(len, test))
+    print(f"训练 {len(train)} 条  测试 {len(test)} 条（平均 {size / len(test) / 1024:.1f} KB/条）  "
+          f"压缩级别 {COMPRESSION_LEVEL}")
+
+    dict_data = zstd.train_dictionary(DICT_SIZE, train, level=COMPRESSION_LEVEL)
+    ok = bench("逐条压缩", zstd.ZstdCompressor(level=COMPRESSION_LEVEL), zstd.ZstdDecompressor(), test)
+    ok &= bench("字典压缩", zstd.ZstdCompressor(level=COMPRESSION_LEVEL, dict_data=dict_data),
+                zstd.ZstdDecompressor(dict_data=dict_data), test)
+    print("解压结果一致" if ok else "解压结果不一致！")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+并发方式基准：单Chrome多标签页(crawl_in_tabs) 与 每个工作进程一个Chrome(CrawlerPool) 对比
+统计吞吐量(页/秒)和所有Chrome/ChromeDriver子进程的内存峰值(RSS)
+用法: python benchmarks/bench_tabs_vs_pool.py [并发数] [视频数]
+默认从all_bvids.json读取BVID；需要本地Chrome、ChromeDriver和psutil
+"""
+import os
+import sys
+import io
+import json
+import time
+import threading
+import contextlib
+
+import psutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from BilibiliVideoInfoCrawler import BilibiliVideoCrawler, CrawlerPool
+
+
+class PeakRssSampler:
+    """后台线程定期统计当前进程所有子进程（ChromeDriver及Chrome）的RSS总和，记录峰值"""
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.peak_mb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        me = psutil.Process()
+        while not self._stop.is_set():
+            total = 0
+            for child in me.children(recursive=True):
+                try:
+                    total += child.memory_info().rss
+                except psutil.Error:
+                    pass
+            self.peak_mb = max(self.peak_mb, total / 1024 / 1024)
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_tabs(bvid_list, concurrency):
+    crawler = BilibiliVideoCrawler(headless=True)
+    try:
+        return crawler.crawl_in_tabs(bvid_list, tabs=concurrency)
+    finally:
+        crawler.close()
+
+
+def run_pool(bvid_list, concurrency):
+    pool = CrawlerPool(size=concurrency, delay=0, max_pages_per_worker=0, headless=True)
+    return list(pool.imap(bvid_list))
+
+
+def bench(name, func, bvid_list, concurrency):
+    with PeakRssSampler() as sampler:
+        start = time.perf_counter()
+        # 爬虫本身输出较多，基准测试只保留汇总结果
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = func(bvid_list, concurrency)
+        elapsed = time.perf_counter() - start
+
+    ok = sum(1 for r in results if 'error' not in r)
+    print(f"{name:<24} {len(results) / elapsed:6.2f} 页/秒  峰值RSS {sampler.peak_mb:8.0f} MB  成功 {ok}/{len(results)}")
+
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    with open(os.path.join(ROOT, 'all_bvids.json'), 'r', encoding='utf-8') as f:
+        bvid_list = json.load(f)[:count]
+
+    print(f"并发数 {concurrency}，视频数 {len(bvid_list)}")
+    bench(f"单Chrome {concurrency} 标签页", run_tabs, bvid_list, concurrency)
+    bench(f"{concurrency} 个Chrome进程", run_pool, bvid_list, concurrency)
+
+
+if __name__ == "__main__":
+    main()